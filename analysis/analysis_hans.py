@@ -18,6 +18,7 @@ import pickle
 torch.set_warn_always(False)
 
 from dataset.utils import load_data
+from dataset.perturbation import DETERMINISTIC_METHODS, output_path
 import time
 
 import matplotlib.pyplot as plt
@@ -27,6 +28,9 @@ import matplotlib.pyplot as plt
 Assumes a directory structure given by score_edges.py .
 """
 
+# seed of the random_* perturbations (the adversial ones are deterministic)
+PERTURBATION_SEED = 123
+
 # Plotting maps
 
 # NOTE: Use color brewer for all colors (https://colorbrewer2.org/#type=qualitative&scheme=Set3&n=4)
@@ -146,9 +150,10 @@ def error_analysis_degree(rank_dict, baseline, out_dir, pert_type):
 
         prop_change = np.abs(np.divide(pert_rank, baseline_rank))
 
-        perturbed_path = f"dataset/perturbation/{pert_type}_remove_{prop}.csv"
-        print("Perturbed path", perturbed_path)
-        G_perturbed, _ = load_data(perturbation_path=perturbed_path)
+        method = f"{pert_type}_remove"
+        perturbed_path = output_path(method, None if method in DETERMINISTIC_METHODS else PERTURBATION_SEED)
+        print("Perturbed path", perturbed_path, prop)
+        G_perturbed, _ = load_data(perturbation_path=perturbed_path, perturbation_proportion=prop)
 
         avg_degs_perturbed = [(G_perturbed.degree[node1] + G_perturbed.degree[node2])/2 for node1, node2 in pos_test_edges]
         
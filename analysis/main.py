@@ -6,7 +6,7 @@ sys.path.append(os.getcwd())
 
 import gzip
 import shutil
-from ogb.linkproppred import Evaluator
+from models.Evaluation import evaluate
 
 from itertools import compress
 
@@ -264,9 +264,6 @@ def plot_hits(props, pert_type, models, out_dir, K=20):
     """ Analyzes model defined at top of file. Assumes directory structure given by running
     get scores.
     """
-    evaluator = Evaluator(name='ogbl-ddi')
-    evaluator.K = K
-
     model2prop_perf = {}
 
     # Get performance for different models
@@ -293,7 +290,7 @@ def plot_hits(props, pert_type, models, out_dir, K=20):
 
             score_dict = pickle.load(open(score_path, "rb"))
 
-            hits = evaluator.eval(score_dict)[f'hits@{K}']
+            hits = evaluate(score_dict['y_pred_pos'], score_dict['y_pred_neg'], ks=[K])[f'hits@{K}']
 
             if model not in model2prop_perf:
                 model2prop_perf[model] = []
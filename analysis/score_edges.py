@@ -3,7 +3,8 @@ import os
 sys.path.append(os.getcwd())
 #####################################################################
 
-from ogb.linkproppred import PygLinkPropPredDataset, Evaluator
+from ogb.linkproppred import PygLinkPropPredDataset
+from models.Evaluation import evaluate
 from models.GraphSAGE import GraphSAGE
 from models.Neighborhood import RuntimeCN
 import pandas as pd
@@ -49,12 +50,9 @@ def test_models(score_paths):
         score_dict = pickle.load(open(score_path, "rb"))
         
         # metrics on test test
-        evaluator = Evaluator(name='ogbl-ddi')
+        metrics = evaluate(score_dict['y_pred_pos'], score_dict['y_pred_neg'], ks=[20, 50, 100])
         for K in [20, 50, 100]:
-            evaluator.K = K
-            hits = evaluator.eval(score_dict)[f'hits@{K}']
-
-            results_test[f'Hits@{K}'] = hits
+            results_test[f'Hits@{K}'] = metrics[f'hits@{K}']
 
         print(f"{score_path}\n\t{results_test}")
 
@@ -82,7 +80,9 @@ def save_scores(model, output_path):
 def get_scores(model_type, model_name, model_list, output_paths):
 
     for model_path, output_path in zip(model_list, output_paths):
-        if not os.path.isfile(model_path):  # Skip model paths that haven't been trained
+        # Skip model paths that haven't been trained (heuristic models are saved as an artifact
+        # directory next to the legacy .pickle path)
+        if not os.path.isfile(model_path) and not os.path.isdir(os.path.splitext(model_path)[0]):
             print(f"\tSkipping {model_path}...")
             continue
         model = model_type()
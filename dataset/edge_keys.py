@@ -0,0 +1,175 @@
+"""
+Helpers for working with undirected edges as packed int64 keys.
+
+An edge (u, v) is stored as the single integer min(u, v) * N + max(u, v), so a set of edges is a
+sorted int64 array and membership tests are a vectorized `np.searchsorted` instead of Python
+tuple hashing.
+"""
+
+import numpy as np
+
+
+def edge_keys(edges:np.ndarray, num_nodes:int) -> np.ndarray:
+    """Packs an (E, 2) array of edges into canonical int64 keys (order is preserved)"""
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    return np.minimum(edges[:, 0], edges[:, 1]) * num_nodes + np.maximum(edges[:, 0], edges[:, 1])
+
+
+def keys_to_edges(keys:np.ndarray, num_nodes:int) -> np.ndarray:
+    """Unpacks keys into an (E, 2) array of edges with u <= v"""
+    keys = np.asarray(keys, dtype=np.int64)
+    return np.stack([keys // num_nodes, keys % num_nodes], axis=1)
+
+
+def unique_keys(keys:np.ndarray) -> np.ndarray:
+    """Sorted, deduplicated copy of `keys` (a plain sort, which beats np.unique on int64 keys)"""
+    keys = np.sort(keys)
+    if len(keys) == 0:
+        return keys
+    return keys[np.concatenate([[True], keys[1:] != keys[:-1]])]
+
+
+def sorted_keys(edges:np.ndarray, num_nodes:int) -> np.ndarray:
+    """Sorted, deduplicated keys of the given edges"""
+    return unique_keys(edge_keys(edges, num_nodes))
+
+
+def contains_keys(sorted_index:np.ndarray, keys:np.ndarray) -> np.ndarray:
+    """Boolean mask of which `keys` appear in the sorted key array `sorted_index`"""
+    if len(sorted_index) == 0:
+        return np.zeros(len(keys), dtype=bool)
+    pos = np.searchsorted(sorted_index, keys)
+    pos[pos == len(sorted_index)] = 0
+    return sorted_index[pos] == keys
+
+
+def sample_non_edges(existing:np.ndarray, num_nodes:int, k:int, rng:np.random.Generator) -> np.ndarray:
+    """
+    Draws k distinct node pairs (u < v) uniformly at random from the pairs whose key is not in
+    the sorted key array `existing`. Candidates are drawn in batches and rejected if they are self
+    loops, existing edges, or already drawn, so time and memory are O(k) for sparse graphs.
+    Returns an (k, 2) array in the order the pairs were drawn.
+    """
+    num_pairs = num_nodes * (num_nodes - 1) // 2
+    if k > num_pairs - len(existing):
+        raise Exception(f"cannot sample {k} non-edges, only {num_pairs - len(existing)} exist")
+
+    accept_rate = 1 - len(existing) / max(num_pairs, 1)
+    sampled = np.empty(0, dtype=np.int64)
+    while len(sampled) < k:
+        needed = k - len(sampled)
+        batch = rng.integers(0, num_nodes, size=(int(needed / accept_rate * 1.1) + 16, 2))
+        batch = batch[batch[:, 0] != batch[:, 1]]
+        keys = edge_keys(batch, num_nodes)
+        keys = keys[~contains_keys(existing, keys)]
+
+        # drop repeats (within the batch and against earlier batches) keeping first occurrences
+        keys = np.concatenate([sampled, keys])
+        _, first = np.unique(keys, return_index=True)
+        sampled = keys[np.sort(first)]
+
+    return keys_to_edges(sampled[:k], num_nodes)
+
+
+class KeyBitmap:
+    """
+    Mutable set of edge keys stored as one bit per possible key (N * N bits), so membership
+    tests and insertions are O(1) and fully vectorized. ogbl-ddi needs about 2.3 MB.
+    """
+
+    def __init__(self, num_nodes:int, keys=None) -> None:
+        self.num_nodes = num_nodes
+        self.bits = np.zeros((num_nodes * num_nodes + 7) // 8, dtype=np.uint8)
+        if keys is not None:
+            self.add(keys)
+
+    def add(self, keys:np.ndarray) -> None:
+        keys = np.asarray(keys, dtype=np.int64)
+        np.bitwise_or.at(self.bits, keys >> 3, (1 << (keys & 7)).astype(np.uint8))
+
+    def contains(self, keys:np.ndarray) -> np.ndarray:
+        keys = np.asarray(keys, dtype=np.int64)
+        return ((self.bits[keys >> 3] >> (keys & 7).astype(np.uint8)) & 1).astype(bool)
+
+
+class SortedKeySet:
+    """Same interface as KeyBitmap backed by a sorted key array, for graphs too large for a bitmap"""
+
+    def __init__(self, num_nodes:int, keys=None) -> None:
+        self.num_nodes = num_nodes
+        self.keys = np.empty(0, dtype=np.int64)
+        if keys is not None:
+            self.add(keys)
+
+    def add(self, keys:np.ndarray) -> None:
+        self.keys = unique_keys(np.concatenate([self.keys, np.asarray(keys, dtype=np.int64)]))
+
+    def contains(self, keys:np.ndarray) -> np.ndarray:
+        return contains_keys(self.keys, np.asarray(keys, dtype=np.int64))
+
+
+def key_set(num_nodes:int, keys=None, max_bitmap_bytes=1 << 30):
+    """Picks a KeyBitmap when N * N bits fit in max_bitmap_bytes and a SortedKeySet otherwise"""
+    if num_nodes * num_nodes // 8 <= max_bitmap_bytes:
+        return KeyBitmap(num_nodes, keys)
+    return SortedKeySet(num_nodes, keys)
+
+
+class EdgeIndex:
+    """
+    Immutable set of undirected edges stored as one sorted, deduplicated int64 key array, i.e.
+    8 bytes per edge instead of a Python tuple in a set. Membership tests, unions and differences
+    are vectorized over whole arrays of edges.
+    """
+
+    def __init__(self, keys:np.ndarray, num_nodes:int, assume_sorted=False) -> None:
+        keys = np.asarray(keys, dtype=np.int64)
+        self.keys = keys if assume_sorted else unique_keys(keys)
+        self.num_nodes = num_nodes
+
+    @classmethod
+    def from_edges(cls, edges:np.ndarray, num_nodes:int):
+        return cls(edge_keys(edges, num_nodes), num_nodes)
+
+    @classmethod
+    def from_splits(cls, split_dict:dict, num_nodes:int, parts=None):
+        """
+        Index of the edges under the given (split, key) pairs of an OGB split dict, by default
+        every positive and negative edge of train, valid and test
+        """
+        if parts is None:
+            parts = [("train", "edge"), ("valid", "edge"), ("valid", "edge_neg"), ("test", "edge"), ("test", "edge_neg")]
+        keys = [edge_keys(split_dict[split][key], num_nodes) for split, key in parts]
+        return cls(np.concatenate(keys), num_nodes)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def contains(self, edges:np.ndarray) -> np.ndarray:
+        """Boolean mask of which of the (E, 2) `edges` are in the index (in either orientation)"""
+        return contains_keys(self.keys, edge_keys(edges, self.num_nodes))
+
+    def contains_keys(self, keys:np.ndarray) -> np.ndarray:
+        return contains_keys(self.keys, np.asarray(keys, dtype=np.int64))
+
+    def union(self, other):
+        """New index holding the edges of both; `other` is an EdgeIndex or an (E, 2) edge array"""
+        other_keys = other.keys if isinstance(other, EdgeIndex) else edge_keys(other, self.num_nodes)
+        return EdgeIndex(np.concatenate([self.keys, other_keys]), self.num_nodes)
+
+    def difference(self, other):
+        """New index holding the edges that are not in `other` (an EdgeIndex or an (E, 2) edge array)"""
+        other_keys = other.keys if isinstance(other, EdgeIndex) else unique_keys(edge_keys(other, self.num_nodes))
+        return EdgeIndex(self.keys[~contains_keys(other_keys, self.keys)], self.num_nodes, assume_sorted=True)
+
+    def sample_complement(self, k:int, rng:np.random.Generator) -> np.ndarray:
+        """k distinct uniformly random node pairs (u < v) that are not in the index, see sample_non_edges"""
+        return sample_non_edges(self.keys, self.num_nodes, k, rng)
+
+    def edges(self) -> np.ndarray:
+        """(E, 2) edges with u <= v in ascending key order"""
+        return keys_to_edges(self.keys, self.num_nodes)
+
+    def nodes(self) -> np.ndarray:
+        """Sorted vertices touched by at least one edge"""
+        return unique_keys(np.concatenate([self.keys // self.num_nodes, self.keys % self.num_nodes]))
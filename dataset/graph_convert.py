@@ -0,0 +1,66 @@
+"""
+Converts training graphs into the tensors used by the torch models.
+
+Every conversion goes through the CSR view of the graph, so building `edge_index` and the
+positive supervision edges is a handful of vectorized numpy ops rather than a Python loop over
+`graph.adjacency()`.
+"""
+
+import itertools
+
+import numpy as np
+import torch
+
+from dataset.graph_store import CSRGraph, build_csr
+
+
+def to_csr_graph(graph) -> CSRGraph:
+    """
+    Returns the CSR view of `graph`, which is either a CSRGraph already (e.g. from
+    `load_graph`) or a networkx graph whose nodes are the integers 0..N-1.
+    """
+    if isinstance(graph, CSRGraph):
+        return graph
+
+    flat = np.fromiter(itertools.chain.from_iterable(graph.edges()), dtype=np.int64)
+    return build_csr(flat.reshape(-1, 2), graph.number_of_nodes())
+
+
+def edge_index(graph, device=None) -> torch.Tensor:
+    """(2, 2E) tensor holding every undirected edge in both directions"""
+    csr = to_csr_graph(graph)
+    index = np.stack([csr.rows(), csr.indices]).astype(np.int64)
+    return torch.from_numpy(index).to(device)
+
+
+def pos_train_edge(graph, device=None) -> torch.Tensor:
+    """(E, 2) tensor holding every undirected edge once (u < v), without self loops"""
+    csr = to_csr_graph(graph)
+    rows = csr.rows()
+    mask = rows < csr.indices
+    edges = np.stack([rows[mask], csr.indices[mask]], axis=1).astype(np.int64)
+    return torch.from_numpy(edges).to(device)
+
+
+def sparse_adj(graph, device=None):
+    """
+    Symmetric adjacency, i.e. equal to its own transpose, so it can be passed as `adj_t` to the
+    PyG convolutions. It is a torch_sparse SparseTensor, or a torch sparse CSR tensor when
+    torch_sparse is not installed.
+    """
+    csr = to_csr_graph(graph)
+    rowptr = torch.from_numpy(np.asarray(csr.indptr, dtype=np.int64))
+    col = torch.from_numpy(np.asarray(csr.indices, dtype=np.int64))
+    try:
+        from torch_sparse import SparseTensor
+        adj = SparseTensor(rowptr=rowptr, col=col, sparse_sizes=(csr.num_nodes, csr.num_nodes), is_sorted=True)
+    except ImportError:
+        values = torch.ones(len(col), dtype=torch.float32)
+        adj = torch.sparse_csr_tensor(rowptr, col, values, (csr.num_nodes, csr.num_nodes))
+    return adj.to(device) if device is not None else adj
+
+
+def graph_tensors(graph, device=None):
+    """Returns (pos_train_edge, edge_index) for `graph`, sharing a single CSR conversion"""
+    csr = to_csr_graph(graph)
+    return pos_train_edge(csr, device), edge_index(csr, device)
@@ -0,0 +1,220 @@
+"""
+Compact on-disk storage for training graphs.
+
+A graph is stored once as an undirected CSR adjacency (indptr/indices as int32 `.npy` files) and
+is memory-mapped on every later load, so callers get the graph in milliseconds instead of
+re-parsing the edge csv and rebuilding a networkx graph.
+"""
+
+import contextlib
+import errno
+import hashlib
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from dataset.edge_keys import sorted_keys, unique_keys
+
+CACHE_DIR = "dataset/cache"
+
+
+class CSRGraph:
+    """
+    Read-only undirected graph in CSR form. Every edge (u, v) is stored in both directions, so
+    the neighbors of `u` are `indices[indptr[u]:indptr[u + 1]]` (sorted).
+    """
+
+    def __init__(self, indptr:np.ndarray, indices:np.ndarray, num_nodes:int) -> None:
+        self.indptr = indptr
+        self.indices = indices
+        self.num_nodes = num_nodes
+
+    def number_of_nodes(self) -> int:
+        return self.num_nodes
+
+    def number_of_edges(self) -> int:
+        return len(self.edges())
+
+    def degree(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def neighbors(self, node:int) -> np.ndarray:
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def rows(self) -> np.ndarray:
+        """Source node of every stored (directed) entry, aligned with `indices`"""
+        return np.repeat(np.arange(self.num_nodes, dtype=self.indices.dtype), self.degree())
+
+    def edges(self) -> np.ndarray:
+        """Returns the (E, 2) array of undirected edges with u <= v"""
+        rows = self.rows()
+        mask = rows <= self.indices
+        return np.stack([rows[mask], self.indices[mask]], axis=1)
+
+    def to_scipy(self):
+        import scipy.sparse as sp
+        data = np.ones(len(self.indices), dtype=np.float32)
+        return sp.csr_matrix((data, self.indices, self.indptr), shape=(self.num_nodes, self.num_nodes))
+
+    def to_networkx(self):
+        import networkx as nx
+        G = nx.Graph()
+        G.add_nodes_from(range(self.num_nodes))
+        G.add_edges_from(self.edges().tolist())
+        return G
+
+
+def build_csr(edges:np.ndarray, num_nodes:int) -> CSRGraph:
+    """
+    Builds a symmetric CSR graph from an (E, 2) array of edges. Duplicate edges (in either
+    direction) are dropped.
+    """
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    if len(edges) > 0:
+        num_nodes = max(num_nodes, int(edges.max()) + 1)
+    src = np.concatenate([edges[:, 0], edges[:, 1]])
+    dst = np.concatenate([edges[:, 1], edges[:, 0]])
+
+    # Sorting packed keys gives row-major order with sorted neighbors, unique drops duplicates
+    keys = unique_keys(src * num_nodes + dst)
+    rows = keys // num_nodes
+    indices = (keys % num_nodes).astype(np.int32)
+
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_nodes), out=indptr[1:])
+    return CSRGraph(indptr.astype(np.int32), indices, num_nodes)
+
+
+@contextlib.contextmanager
+def publish_dir(path:str, replace=False):
+    """
+    Yields an empty temporary directory next to `path`; once the block has written it, it is
+    renamed to `path`, so readers never see a partial directory. The temporary directory is
+    removed on every path out, including errors.
+
+    If `path` is already published, it is kept when replace=False (content-addressed entries,
+    where it holds the same data) and this copy discarded. With replace=True the published
+    directory is renamed aside and the new one renamed into its place right after, so `path` is
+    only missing between two renames (never while files are written or deleted); readers that
+    already opened or memory-mapped the old files keep them.
+    """
+    parent = os.path.dirname(path) or "."
+    os.makedirs(parent, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(prefix=f"{os.path.basename(path)}.tmp", dir=parent)
+    try:
+        yield tmp_path
+        while True:
+            try:
+                os.replace(tmp_path, path)
+                return
+            except OSError as error:
+                # renaming onto a non-empty directory fails: `path` is published already
+                if error.errno not in (errno.ENOTEMPTY, errno.EEXIST):
+                    raise
+            if not replace:
+                return
+            aside = tempfile.mkdtemp(prefix=f"{os.path.basename(path)}.old", dir=parent)
+            try:
+                os.replace(path, aside)
+            except FileNotFoundError:
+                pass   # another writer moved it aside first
+            shutil.rmtree(aside, ignore_errors=True)
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def save_csr(graph:CSRGraph, path:str, edges=None) -> None:
+    """
+    Writes the graph to directory `path`, optionally along with the (E, 2) edge array it was
+    built from, published with publish_dir. Entries are immutable: if another process publishes
+    `path` first, its entry is kept and this one discarded.
+    """
+    with publish_dir(path) as tmp_path:
+        np.save(os.path.join(tmp_path, "indptr.npy"), graph.indptr)
+        np.save(os.path.join(tmp_path, "indices.npy"), graph.indices)
+        if edges is not None:
+            np.save(os.path.join(tmp_path, "edges.npy"), np.ascontiguousarray(edges, dtype=np.int64))
+
+
+def load_csr(path:str, mmap=True) -> CSRGraph:
+    mmap_mode = "r" if mmap else None
+    indptr = np.load(os.path.join(path, "indptr.npy"), mmap_mode=mmap_mode)
+    indices = np.load(os.path.join(path, "indices.npy"), mmap_mode=mmap_mode)
+    return CSRGraph(indptr, indices, len(indptr) - 1)
+
+
+def read_edge_csv(edge_path:str) -> np.ndarray:
+    """Reads a headerless `source,target` csv into an (E, 2) int64 array"""
+    df = pd.read_csv(edge_path, names=["source", "target"], dtype=np.int64)
+    return df.to_numpy()
+
+
+def cache_entry(edge_path:str, num_nodes:int, cache_dir=CACHE_DIR) -> str:
+    """
+    Returns the cache directory for the edge csv at `edge_path`, converting the csv on the first
+    call only. The entry is keyed on the csv's path, size and modification time, so regenerating a
+    perturbation file invalidates its cached graph.
+    """
+    stat = os.stat(edge_path)
+    key = f"{os.path.abspath(edge_path)}:{stat.st_size}:{stat.st_mtime_ns}:{num_nodes}"
+    name = os.path.basename(edge_path).split(".csv")[0]
+    path = os.path.join(cache_dir, "graphs", f"{name}-{hashlib.sha1(key.encode()).hexdigest()[:16]}")
+
+    if not os.path.isfile(os.path.join(path, "edges.npy")):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        edges = read_edge_csv(edge_path)
+        save_csr(build_csr(edges, num_nodes), path, edges=edges)
+    return path
+
+
+def cached_csr(edge_path:str, num_nodes:int, cache_dir=CACHE_DIR) -> CSRGraph:
+    """Returns the memory-mapped CSR view of the edge csv at `edge_path`"""
+    return load_csr(cache_entry(edge_path, num_nodes, cache_dir))
+
+
+def cached_edges(edge_path:str, num_nodes:int, cache_dir=CACHE_DIR) -> np.ndarray:
+    """
+    Returns the edges of the csv at `edge_path` as a memory-mapped (E, 2) int64 array, in file
+    order. The mapping is copy-on-write, so it can be handed to `torch.from_numpy` directly.
+    """
+    path = cache_entry(edge_path, num_nodes, cache_dir)
+    return np.load(os.path.join(path, "edges.npy"), mmap_mode="c")
+
+
+def graph_hash(edges:np.ndarray, num_nodes:int) -> str:
+    """
+    Content hash of an undirected graph given as an (E, 2) edge array. Edge order, orientation
+    and duplicates do not change the hash.
+    """
+    digest = hashlib.sha256(f"{num_nodes}:".encode())
+    digest.update(sorted_keys(edges, num_nodes).tobytes())
+    return digest.hexdigest()
+
+
+GRAPH_STORE_DIR = os.environ.get("LINKPRED_GRAPH_STORE", os.path.join(os.path.expanduser("~"), ".cache", "linkpred", "graphs"))
+
+
+def store_graph(graph:CSRGraph, store_dir=None) -> str:
+    """
+    Adds the graph to the content-addressed graph store (store_dir/<graph_hash>) unless it is
+    already there, and returns its hash. Models record only this hash in their checkpoints.
+    """
+    store_dir = GRAPH_STORE_DIR if store_dir is None else store_dir
+    key = graph_hash(graph.edges(), graph.num_nodes)
+    path = os.path.join(store_dir, key)
+    if not os.path.isfile(os.path.join(path, "indices.npy")):
+        os.makedirs(store_dir, exist_ok=True)
+        save_csr(graph, path)
+    return key
+
+
+def resolve_graph(key:str, store_dir=None, mmap=True) -> CSRGraph:
+    """Memory-mapped CSRGraph stored under `key` by store_graph"""
+    store_dir = GRAPH_STORE_DIR if store_dir is None else store_dir
+    path = os.path.join(store_dir, key)
+    if not os.path.isdir(path):
+        raise Exception(f"Graph {key} is not in the graph store {store_dir}")
+    return load_csr(path, mmap)
@@ -1,385 +1,455 @@
+import sys
+import os
+sys.path.append(os.getcwd())
+#####################################################################
+
+import argparse
 import csv
-import random
+import time
+import numpy as np
+import scipy.sparse as sp
+from concurrent.futures import ProcessPoolExecutor
+
+from dataset.utils import load_graph, load_splits
+from dataset.perturbation_store import save_ranked_perturbation
+from dataset.edge_keys import EdgeIndex, edge_keys, key_set, keys_to_edges
+
+PERTURBATION_DIR = "dataset/perturbation"
+METHODS = ["random_remove", "random_add", "random_swap", "adversial_remove", "adversial_add"]
+DETERMINISTIC_METHODS = ["adversial_remove", "adversial_add"]
 
-from utils import load_data
 
-def perturb_data(method="random", seed=123, perturbation_amount=0):
+def perturb_data(method="random", seed=123, perturbation_amount=0, graph=None, split_dict=None):
     """
-    Given a networkx graph, returns new version of the graph with edges removed according to the
-    given method. Proportion indicates the proportion of edges that are perturbed.
+    Generates the perturbation `method` of the training graph.
+
+    random_remove, random_add, adversial_remove and adversial_add write a single ranked
+    perturbation artifact (see dataset/perturbation_store.py) from which every proportion can be
+    loaded, and return its path. For the add methods, perturbation_amount (a proportion or a list
+    of them) is the largest proportion the artifact has to support. random_swap writes a csv with
+    perturbation_amount swapped edge pairs (a number of swaps, or a float proportion of |E|).
+
+    The base graph and splits are loaded from the cache unless they are passed in.
     """
 
     if perturbation_amount == 0:
         raise Exception("needs to specify perturbation amount")
+    max_amount = max(perturbation_amount) if isinstance(perturbation_amount, list) else perturbation_amount
 
-    random.seed(seed)
+    rng = job_rng(method, seed, perturbation_amount)
 
-    graph, split_dict = load_data()
+    if graph is None:
+        graph = load_graph()
+    if split_dict is None:
+        split_dict = load_splits()
 
     match method:
         case "random_remove":
-            return random_remove(split_dict, perturbation_amount)
+            return random_remove(split_dict, graph, rng, output_path(method, seed), seed)
         case "random_add":
-            return random_add(split_dict, graph, perturbation_amount)
+            return random_add(split_dict, graph, max_amount, rng, output_path(method, seed), seed)
         case "random_swap":
-            return random_swap(split_dict, graph, perturbation_amount)
+            num_swaps = perturbation_amount
+            if isinstance(num_swaps, float):
+                num_swaps = int(perturbation_amount * len(split_dict["train"]["edge"]))
+            return random_swap(split_dict, graph, num_swaps, rng, output_path(method, seed, perturbation_amount))
         case "adversial_remove":
-            return adversial_remove(split_dict, graph, perturbation_amount)
+            return adversial_remove(split_dict, graph, output_path(method))
         case "adversial_add":
-            return adversial_add(split_dict, graph, perturbation_amount)
+            return adversial_add(split_dict, graph, max_amount, output_path(method))
         case _:
             raise Exception(f"{method} is not a supported method for edge removal.")
-        
-def adversial_add(split_dict, graph, perturbation_percentages):
-    train = split_dict["train"]
-    valid = split_dict["valid"]
-    test = split_dict["test"]
 
-    edges = train["edge"]
-    hidden_edges = test["edge"] # these are all the edges that we want to hide from
 
-    existing_edges = get_existing_edges(train, valid, test)
-    all_edges = get_all_possible_edges(graph.number_of_nodes())
-    potential_edges = list(all_edges.difference(existing_edges)) # all the edges that we can potentially add
+def job_rng(method, seed, perturbation_amount):
+    """
+    Random stream of one perturbation job. It only depends on the job itself (method, seed and,
+    for random_swap, the number of swaps), so results do not depend on which worker runs it or
+    in which order.
+    """
+    spawn_key = (METHODS.index(method),)
+    if method == "random_swap":
+        spawn_key += (round(perturbation_amount * 10**6),)
+        if isinstance(perturbation_amount, int):
+            spawn_key += (1,)   # a count of swaps, not to be confused with the same proportion
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=spawn_key))
+
+
+def output_path(method, seed=None, perturbation_amount=None):
+    """Where perturb_data writes the output of a job (deterministic methods take no seed)"""
+    if method == "random_swap":
+        return os.path.join(PERTURBATION_DIR, f"random_swap_{perturbation_amount}_seed{seed}.csv")
+    name = method if seed is None else f"{method}_seed{seed}"
+    return os.path.join(PERTURBATION_DIR, name)
+
+
+def generate_perturbations(methods, seeds, amounts, workers=None, swap_counts=()):
+    """
+    Generates the whole (method, seed, amount) grid with a pool of `workers` processes (all
+    cores by default) and returns the output paths. Amounts are proportions of |E|. If
+    swap_counts is given, random_swap runs one job per absolute number of swaps in it instead of
+    one per proportion.
+
+    Ranked methods need one job per seed (one per method for the deterministic adversarial
+    ones) since every proportion is a slice of the same artifact; random_swap needs one job per
+    (seed, amount). The base graph and splits are memory-mapped from the cache, so all workers
+    share one read-only copy through the page cache.
+    """
+    jobs = []
+    for method in methods:
+        if method in DETERMINISTIC_METHODS:
+            jobs.append((method, None, max(amounts)))
+        elif method == "random_swap":
+            swap_amounts = [int(count) for count in swap_counts] if swap_counts else amounts
+            jobs += [(method, seed, amount) for seed in seeds for amount in swap_amounts]
+        else:
+            jobs += [(method, seed, max(amounts)) for seed in seeds]
+
+    # build the caches once up front so the workers only ever map them
+    load_graph()
+    load_splits()
+    os.makedirs(PERTURBATION_DIR, exist_ok=True)
+
+    if workers == 1:
+        return [perturb_data(method, seed, amount) for method, seed, amount in jobs]
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=init_worker) as pool:
+        futures = [pool.submit(run_job, *job) for job in jobs]
+        return [future.result() for future in futures]
+
+
+# base graph and splits of a pool worker, mapped once per process
+worker_base = {}
+
+def init_worker():
+    worker_base["graph"] = load_graph()
+    worker_base["split_dict"] = load_splits()
+
+def run_job(method, seed, amount):
+    start = time.time()
+    path = perturb_data(method, seed, amount, graph=worker_base["graph"], split_dict=worker_base["split_dict"])
+    print(f"=> {method} seed={seed} amount={amount}: {path} ({round(time.time() - start, 2)}s)")
+    return path
+
+def adversial_add(split_dict, graph, max_percentage, out_path):
+    """
+    Ranks candidate edges to add so that the hidden (test) edges are as hard to find as possible
+    (see adversial_add_scores) and stores the best max_percentage * |E| as an addition artifact.
+    """
+    num_nodes = graph.number_of_nodes()
+    edges = split_dict["train"]["edge"]
+    hidden_edges = split_dict["test"]["edge"] # these are all the edges that we want to hide from
+    existing_edges = get_existing_edges(split_dict, num_nodes)
 
     # first of all, checks whether train or test set spans the entire graph
-    print('total number of vertices in graph', graph.number_of_nodes())
+    print('total number of vertices in graph', num_nodes)
     print("train set vertex cover count", get_vertex_cover_cnt(edges)) # train set covers all vertices
     print("test set vertex cover count", get_vertex_cover_cnt(hidden_edges)) # test set only covers a subset of vertices
 
-    # construct adjency list
-    adjency_list = {}
-    ordered_edge_set = set()
-    for edge in edges:
-        v1 = edge[0]
-        v2 = edge[1]
-        if v1 not in adjency_list:
-            adjency_list[v1] = set()
-        if v2 not in adjency_list:
-            adjency_list[v2] = set()
-        adjency_list[v1].add(v2)
-        adjency_list[v2].add(v1)
-        ordered_edge_set.add((min(v1, v2), max(v1, v2)))
-    edges = ordered_edge_set
-
-    # get all vertices in test set
-    vertices_in_hidden_edges = set()
-    ordered_hidden_edges = set() 
-    for edge in hidden_edges:
-        vertices_in_hidden_edges.add(edge[0])
-        vertices_in_hidden_edges.add(edge[1])
-        ordered_hidden_edges.add((min(edge[0], edge[1]), max(edge[0], edge[1])))
-    hidden_edges = ordered_hidden_edges # make the hidden edge ordered v1 < v2 and into the set form
-    
-    # filter down list of edges to remove from, we want the edge to touch one vertex from any of the hidden edges
-    print("before filtering, there are", len(potential_edges), "edges to consider") 
-    filtered_down_edges = set()
-    for edge in potential_edges:
-        vertex1 = edge[0]
-        vertex2 = edge[1]
-        if vertex1 in vertices_in_hidden_edges or vertex2 in vertices_in_hidden_edges:
-            filtered_down_edges.add((min(vertex1, vertex2), max(vertex1, vertex2)))
-    print("after filtering, there are", len(filtered_down_edges), "edges to consider")    
-
-    # intialize edge scores
-    edge_scores = {}
-    for edge in filtered_down_edges:
-        vertex1 = min(edge[0], edge[1])
-        vertex2 = max(edge[0], edge[1])
-        edge_scores[(vertex1, vertex2)] = 0
-    
-    vertices_set = set(range(0, graph.number_of_nodes()))
-    
-    idx = 0
-    for edge in filtered_down_edges:
-        print('iteration', idx)
-        vertex1 = edge[0]
-        vertex2 = edge[1]
-        negative_edge_score = False
-        for vertex3 in vertices_set:
-            # for edge XY and any vertex in the graph V, for edges XV and YV
-            # if one of the edges is existing edge and the other is a hidden edge,
-            # then it will make the hidden edge more exposed, thus we assign a negative
-            # score to it to indicate it is a bad candidate.
-            edge1 = (min(vertex1, vertex3), max(vertex1, vertex3))
-            edge2 = (min(vertex2, vertex3), max(vertex2, vertex3))
-            if edge1 in hidden_edges and edge2 in edges:
-                negative_edge_score = True
-                break
-            if edge1 in edges and edge2 in hidden_edges:
-                negative_edge_score = True
-                break
-        if negative_edge_score:
-            edge_scores[edge] = -1
-        else:
-            # otherwise, the score is assigned the union of X and Y's neighbors (the more neighbors, the more
-            # likely other links will be chosen over the hidden link)
-            vertex1_neighbors = adjency_list[vertex1]
-            vertex2_neighbors = adjency_list[vertex2]
-            edge_scores[edge] = len(vertex1_neighbors.union(vertex2_neighbors))
-        idx += 1
-
-    # sort edges based on descending edge scores
-    edge_scores = list(edge_scores.items())
-    edge_scores.sort(key=lambda e : -e[1])
-
-    non_negative_one_cnt = 0
-    for edge_score in edge_scores:
-        if edge_score[1] != -1:
-            non_negative_one_cnt = non_negative_one_cnt + 1
-    print("there are", non_negative_one_cnt, "non-negative scores out of", len(edge_scores), "total edges")
-    print('top five scores', edge_scores[0:5])
-
-    added_edges = [e[0] for e in edge_scores]
-
-    # loop over each percentage
-    for perturbation_percentage in perturbation_percentages:
-
-        # take the [0:k] new edges, where k is derived from the preturbation percentage
-        added_cnt = int(perturbation_percentage * len(edges))
-        selected_edges = added_edges[0:added_cnt]
-
-        # write to output file
-        file_name = f"dataset/perturbation/adversial_add_{perturbation_percentage}.csv"
-        with open(file_name, 'w', newline='') as file:
-            writer = csv.writer(file)
-            for edge in selected_edges:
-                writer.writerow(edge)
-    
-def adversial_remove(split_dict, graph, perturbation_percentage):
+    candidate_keys, scores = adversial_add_scores(edges, hidden_edges, existing_edges, num_nodes)
+    print("there are", len(candidate_keys), "edges to consider")
+    print("there are", np.count_nonzero(scores != -1), "non-negative scores out of", len(scores), "total edges")
+
+    # only the best max_percentage * |E| candidates are ever needed
+    max_cnt = int(max_percentage * len(edges))
+    order = top_k_order(scores, candidate_keys, max_cnt)
+    added_edges = keys_to_edges(candidate_keys[order], num_nodes)
+    print('top five scores', list(zip(added_edges[0:5].tolist(), scores[order[0:5]].tolist())))
+
+    save_ranked_perturbation(out_path, added_edges, kind="add", method="adversial_add", seed=None,
+                             base_edges=edges, num_nodes=num_nodes)
+    return out_path
+
+
+def adversial_add_scores(edges, hidden_edges, existing_edges, num_nodes, block_size=512):
+    """
+    Scores every candidate edge for adversial_add. Candidates are the node pairs that are not in
+    the EdgeIndex `existing_edges` and touch at least one vertex of a hidden edge. For a candidate XY:
+      - if some vertex V has XV hidden and YV in the training graph (or the other way around),
+        adding XY would make the hidden edge more exposed, so the score is -1
+      - otherwise the score is the size of the union of X's and Y's neighborhoods (the more
+        neighbors, the more likely other links will be chosen over the hidden link)
+
+    Both tests come from sparse products computed `block_size` rows at a time: (H @ A)[x, y]
+    counts the hidden/train paths x-V-y, (A @ A)[x, y] the common neighbors of x and y.
+    Returns the candidate keys (ascending) and their int64 scores.
+    """
+    adj = key_adjacency(EdgeIndex.from_edges(edges, num_nodes).keys, num_nodes)
+    hidden_adj = key_adjacency(EdgeIndex.from_edges(hidden_edges, num_nodes).keys, num_nodes)
+    degree = np.diff(adj.indptr).astype(np.int64)
+
+    in_hidden = np.zeros(num_nodes, dtype=bool)
+    in_hidden[np.asarray(hidden_edges, dtype=np.int64).ravel()] = True
+
+    all_keys = []
+    all_scores = []
+    nodes = np.arange(num_nodes, dtype=np.int64)
+    for start in range(0, num_nodes, block_size):
+        rows = nodes[start:start + block_size]
+
+        # candidate pairs u < v in this block of rows that touch a hidden vertex
+        u = np.repeat(rows, num_nodes)
+        v = np.tile(nodes, len(rows))
+        mask = (v > u) & (in_hidden[u] | in_hidden[v])
+        u, v = u[mask], v[mask]
+        keys = u * num_nodes + v
+        mask = ~existing_edges.contains_keys(keys)
+        u, v, keys = u[mask], v[mask], keys[mask]
+        local = u - start
+
+        block = slice(start, start + len(rows))
+        exposed = ((hidden_adj[block] @ adj).toarray()[local, v] > 0) | ((adj[block] @ hidden_adj).toarray()[local, v] > 0)
+        common = (adj[block] @ adj).toarray()[local, v].astype(np.int64)
+
+        all_keys.append(keys)
+        all_scores.append(np.where(exposed, -1, degree[u] + degree[v] - common))
+
+    return np.concatenate(all_keys), np.concatenate(all_scores)
+
+
+def top_k_order(scores, keys, k):
+    """
+    Indices of the k best candidates, sorted by descending score and then ascending key. Uses a
+    partial sort, so only the candidates scoring at least the k-th best score are fully ordered.
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    negated = -np.asarray(scores)
+    if k < len(negated):
+        # every candidate tied with the k-th best is kept, the key decides between them below
+        kth = np.partition(negated, k - 1)[k - 1]
+        selected = np.flatnonzero(negated <= kth)
+    else:
+        selected = np.arange(len(negated))
+    return selected[np.lexsort((keys[selected], negated[selected]))][:k]
+
+
+def key_adjacency(keys, num_nodes):
+    """Symmetric scipy CSR adjacency (int32 entries) of the edges with the given keys"""
+    edges = keys_to_edges(keys, num_nodes)
+    loops = edges[:, 0] == edges[:, 1]
+    rows = np.concatenate([edges[:, 0], edges[~loops, 1]])
+    cols = np.concatenate([edges[:, 1], edges[~loops, 0]])
+    data = np.ones(len(rows), dtype=np.int32)
+    return sp.csr_matrix((data, (rows, cols)), shape=(num_nodes, num_nodes))
+
+def adversial_remove(split_dict, graph, out_path):
+    """
+    Ranks the training edges by how many hidden (test) edges they help expose (see
+    adversial_remove_order) and stores that removal order as an artifact.
+    """
     train = split_dict["train"]
     test = split_dict["test"]
 
     edges = train["edge"] # these are all the edges that we want to remove from 
     hidden_edges = test["edge"] # these are all the edges that we want to hide from
-    
-    # intialize edge scores
-    edge_scores = {}
-    for edge in edges:
-        vertex1 = min(edge[0], edge[1])
-        vertex2 = max(edge[0], edge[1])
-        edge_scores[(vertex1, vertex2)] = 0
 
     # first of all, checks whether train or test set spans the entire graph
     print('total number of vertices in graph', graph.number_of_nodes())
     print("train set vertex cover count", get_vertex_cover_cnt(edges)) # train set covers all vertices
     print("test set vertex cover count", get_vertex_cover_cnt(hidden_edges)) # test set only covers a subset of vertices
 
-    # construct adjency list
-    adjency_list = {}
-    for edge in edges:
-        v1 = edge[0]
-        v2 = edge[1]
-        if v1 not in adjency_list:
-            adjency_list[v1] = set()
-        if v2 not in adjency_list:
-            adjency_list[v2] = set()
-        adjency_list[v1].add(v2)
-        adjency_list[v2].add(v1)
-
-    # get all vertices in test set
-    vertices_in_hidden_edges = set()
-    for edge in hidden_edges:
-        vertices_in_hidden_edges.add(edge[0])
-        vertices_in_hidden_edges.add(edge[1])
-    
-    # filter down list of edges to remove from, we want the edge to touch one vertex from any of the hidden edges
-    filtered_down_edges = set()
-    for edge in edges:
-        vertex1 = edge[0]
-        vertex2 = edge[1]
-        if vertex1 in vertices_in_hidden_edges or vertex2 in vertices_in_hidden_edges:
-            filtered_down_edges.add((min(vertex1, vertex2), max(vertex1, vertex2)))
-
-    # for each hidden edge, examine the common neihbors and check if a triangle is formed
-    for edge in hidden_edges:
-        vertex1 = edge[0]
-        vertex2 = edge[1]
-        common_neighbors = adjency_list[vertex1].intersection(adjency_list[vertex2])
-        for n in common_neighbors:
-            edge1 = (min(vertex1, n), max(vertex1, n))
-            edge2 = (min(vertex2, n), max(vertex2, n))
-            if edge1 in filtered_down_edges and edge2 in filtered_down_edges:
-                edge_scores[edge1] += 1
-                edge_scores[edge2] += 1
-
-    # sort edges based on descending edge scores
-    edge_scores = list(edge_scores.items())
-    edge_scores.sort(key=lambda e : -e[1])
-
-    # take the [k:] remaining edges, where k is derived from the preturbation percentage
-    removed_cnt = int(perturbation_percentage * len(edges))
-    remaining_edges = edge_scores[removed_cnt:]
-    remaining_edges = [e[0] for e in remaining_edges]
-
-    # write to output file
-    file_name = f"dataset/perturbation/adversial_remove_{perturbation_percentage}.csv"
-    with open(file_name, 'w', newline='') as file:
-        writer = csv.writer(file)
-        for new_edge in remaining_edges:
-            writer.writerow(new_edge)
+    ranked_edges, _ = adversial_remove_order(edges, hidden_edges, graph.number_of_nodes())
+
+    # removing a proportion p keeps ranked_edges[int(p * len(edges)):]
+    save_ranked_perturbation(out_path, ranked_edges, kind="remove", method="adversial_remove", seed=None,
+                             base_edges=edges, num_nodes=graph.number_of_nodes())
+    return out_path
+
 
-def get_vertex_cover_cnt(edges: list):
-    vertex_set = set()
-    for edge in edges:
-        vertex_set.add(edge[0])
-        vertex_set.add(edge[1])
-    return len(vertex_set)
+def adversial_remove_order(edges, hidden_edges, num_nodes):
+    """
+    Ranks the training edges for adversial_remove. A training edge scores one point for every
+    hidden edge it closes a triangle with (the third side being another training edge), since
+    those are the edges that make the hidden edge predictable by common neighbors.
+
+    For a training edge (a, b) that count is (H @ A)[a, b] + (H @ A)[b, a], where A is the
+    training adjacency and H counts the hidden edges, so all scores come from one sparse product
+    masked to the training edges.
 
-def random_remove(split_dict, perturbation_percentage):
+    Returns the deduplicated training edges (u < v) and their scores, ordered by descending
+    score with ties kept in first-occurrence order of the training edges.
+    """
+    keys = edge_keys(edges, num_nodes)
+    _, first = np.unique(keys, return_index=True)
+    keys = keys[np.sort(first)]
+    train_edges = keys_to_edges(keys, num_nodes)
+
+    adj = key_adjacency(np.sort(keys), num_nodes)
+    hidden_edges = np.asarray(hidden_edges, dtype=np.int64).reshape(-1, 2)
+    rows = np.concatenate([hidden_edges[:, 0], hidden_edges[:, 1]])
+    cols = np.concatenate([hidden_edges[:, 1], hidden_edges[:, 0]])
+    hidden_adj = sp.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=(num_nodes, num_nodes))
+
+    # masking with A keeps only the entries at training edges, symmetrizing adds both directions
+    triangles = (hidden_adj @ adj).multiply(adj).tocsr()
+    triangles = (triangles + triangles.T).tocoo()
+    entry_keys = triangles.row.astype(np.int64) * num_nodes + triangles.col
+    order = np.argsort(entry_keys)
+    pos = np.searchsorted(entry_keys[order], keys)
+    pos[pos == len(entry_keys)] = 0
+    found = entry_keys[order][pos] == keys
+    scores = np.where(found, triangles.data[order][pos], 0).astype(np.int64)
+
+    order = np.argsort(-scores, kind="stable")
+    return train_edges[order], scores[order]
+
+def get_vertex_cover_cnt(edges: np.ndarray):
+    return len(np.unique(np.asarray(edges).ravel()))
+
+def random_remove(split_dict, graph, rng, out_path, seed=None):
     """
     Randomly removing k edges involves selecting k edges uniformly at random
-    and removing those from the training data.
+    and removing those from the training data. The stored order is a random shuffle of the
+    training edges, so every proportion removes a uniformly random subset.
     """
 
     train_edges = split_dict["train"]["edge"]
-    old_edges_cnt = len(train_edges)
+    shuffled_edges = train_edges[rng.permutation(len(train_edges))]
 
-    removed_cnt = int(perturbation_percentage * old_edges_cnt)
-    random.shuffle(train_edges) 
-    new_edges = train_edges[removed_cnt:]
-
-    file_name = f"dataset/perturbation/random_remove_{perturbation_percentage}.csv"
-    with open(file_name, 'w', newline='') as file:
-        writer = csv.writer(file)
-        for new_edge in new_edges:
-            writer.writerow(new_edge)
+    save_ranked_perturbation(out_path, shuffled_edges, kind="remove", method="random_remove", seed=seed,
+                             base_edges=train_edges, num_nodes=graph.number_of_nodes())
+    return out_path
 
-def random_add(split_dict, graph, perturbation_percentage):
+def random_add(split_dict, graph, max_percentage, rng, out_path, seed=None):
     """
     Randomly adding k edges involves choosing k edges that are not in the list
     of edges used for training uniformly at random and adding those to the training data. 
+    The stored order holds max_percentage * |E| such edges in the order they were drawn.
     """
 
-    train = split_dict["train"]
-    valid = split_dict["valid"]
-    test = split_dict["test"]
-
-    existing_edges = get_existing_edges(train, valid, test)
-    all_edges = get_all_possible_edges(graph.number_of_nodes())
-    potential_edges = list(all_edges.difference(existing_edges))
+    train_edges = split_dict["train"]["edge"]
+    num_nodes = graph.number_of_nodes()
+    existing_edges = get_existing_edges(split_dict, num_nodes)
 
-    random.shuffle(potential_edges) 
-    new_edges_cnt = int(len(train["edge"]) * perturbation_percentage)
-    new_edges = potential_edges[0: new_edges_cnt]
+    new_edges_cnt = int(len(train_edges) * max_percentage)
+    new_edges = existing_edges.sample_complement(new_edges_cnt, rng)
 
-    # TODO: make sure you also append the original set of edges at the end of the generated csv
-    file_name = f"dataset/perturbation/random_add_{perturbation_percentage}.csv"
-    with open(file_name, 'w', newline='') as file:
-        writer = csv.writer(file)
-        for new_edge in new_edges:
-            writer.writerow(new_edge)
+    save_ranked_perturbation(out_path, new_edges, kind="add", method="random_add", seed=seed,
+                             base_edges=train_edges, num_nodes=num_nodes)
+    return out_path
 
-def random_swap(split_dict, graph, num_edges_to_swap):
+def random_swap(split_dict, graph, num_edges_to_swap, rng, out_path):
     """
     Randomly swapping k edges involves selecting k pairs of edges (u1, v1) and (u2, v2)
     uniformly at random, removing these from the data, and adding (u2, v1) and (u1, v2), 
     effectively swapping their endpoints 
     """
     
-    train = split_dict["train"]
-    valid = split_dict["valid"]
-    test = split_dict["test"]
-    train_edges = train["edge"]
-
-    existing_edges = get_existing_edges(train, valid, test)
-    all_edges = get_all_possible_edges(graph.number_of_nodes())
-    potential_edges = list(all_edges.difference(existing_edges))
+    num_nodes = graph.number_of_nodes()
+    existing_edges = get_existing_edges(split_dict, num_nodes)
+
+    new_edges, stats = double_edge_swap(split_dict["train"]["edge"], existing_edges, num_nodes, num_edges_to_swap, rng)
+    print(f"{stats['accepted']} swaps out of {stats['proposed']} proposals "
+          f"(acceptance rate {round(stats['acceptance_rate'], 4)}, {int(stats['swaps_per_sec'])} swaps/s)")
+    if stats["stalled"]:
+        raise Exception(f"Only {stats['accepted']} of {num_edges_to_swap} swaps could be made, not writing {out_path}")
+
+    # write next to the destination and rename, so readers never see a partial file
+    tmp_path = f"{out_path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerows(new_edges.tolist())
+    os.replace(tmp_path, out_path)
+    return out_path
 
-    count = 0 # how many times we have seapped so far
-    deleted = set() # all the edges that need to be removed at the end
-    added = set() # all the edges that need to be addeda at the end
 
-    visited = set()
+def double_edge_swap(edges, existing_edges, num_nodes, num_swaps, rng, batch_size=65536, max_stalled_batches=10):
+    """
+    Degree-preserving double edge swaps. Each proposal picks two edges (a, b) and (c, d) at
+    random (with a random orientation for the second) and replaces them by (a, d) and (c, b). A
+    proposal is accepted if the four endpoints are distinct and neither new edge is in the
+    EdgeIndex `existing_edges` or has been added by an earlier swap.
 
+    Proposals are drawn and checked `batch_size` at a time against an O(1) key bitmap. Within a
+    batch, a proposal is dropped if it reuses an edge or a new edge of an earlier proposal, so
+    accepted swaps never conflict and can be applied at once.
 
-    while True:
-        if count == num_edges_to_swap: 
-            break
-        else:
-            
-            # pick two random edges and see if they are eligible for swapping
-            first_edge_idx = random.randint(0, len(train_edges) - 1)
-            second_edge_idx = random.randint(0, len(train_edges) - 1)
-
-            # ignore if already visited before
-            smaller_idx = min(first_edge_idx, second_edge_idx)
-            larger_idx = max(first_edge_idx, second_edge_idx)
-            if (smaller_idx, larger_idx) in visited:
-                continue
-
-            # make sure starting vertex < ending vertex for first and second edge
-            first_edge_i = min(train_edges[first_edge_idx][0], train_edges[first_edge_idx][1])
-            first_edge_j = max(train_edges[first_edge_idx][0], train_edges[first_edge_idx][1])
-            second_edge_i = min(train_edges[second_edge_idx][0], train_edges[second_edge_idx][1])
-            second_edge_j = max(train_edges[second_edge_idx][0], train_edges[second_edge_idx][1])
-
-            # do not consider if any of the vertices are equal to each other
-            if first_edge_i == second_edge_i or first_edge_j == second_edge_j \
-            or first_edge_i == second_edge_j or first_edge_j == second_edge_i:
-                continue
-
-            # generate two new edges by swapping
-            first_new_edge = (min(first_edge_i, second_edge_j), max(first_edge_i, second_edge_j))
-            second_new_edge = (min(first_edge_j, second_edge_i), max(first_edge_j, second_edge_i))
-
-            # update count, update added and deleted set
-            if first_new_edge in potential_edges and second_new_edge in potential_edges:
-                deleted.add((train_edges[first_edge_idx][0], train_edges[first_edge_idx][1]))
-                deleted.add((train_edges[second_edge_idx][0], train_edges[second_edge_idx][1]))
-                added.add(first_new_edge)
-                added.add(second_new_edge)
-                count = count + 1
-                visited.add((smaller_idx, larger_idx))
-
-                print('Found, current count', count)
-        
-    new_existing_edges = set()
-    for edge in train_edges:
-        new_existing_edges.add((edge[0], edge[1]))
-
-    # remove all edges from deleted set
-    for d in deleted:
-        new_existing_edges.remove(d)
-    
-    # add all edges from added set
-    for a in added:
-        new_existing_edges.add(a)
+    Every accepted swap only adds keys to the bitmap, so acceptance never recovers once it drops
+    off (dense or tiny graphs). After max_stalled_batches consecutive batches without an accepted
+    swap, it gives up with fewer than num_swaps swaps and stats["stalled"] set.
 
-    file_name = f"dataset/perturbation/random_swap_{num_edges_to_swap}.csv"
-    with open(file_name, 'w', newline='') as file:
-        writer = csv.writer(file)
-        for new_edge in train_edges:
-            writer.writerow(new_edge)
+    Returns the swapped (E, 2) edges (u < v, one per undirected edge) and a dict of stats.
+    """
+    train_edges = EdgeIndex.from_edges(edges, num_nodes)
+    current = train_edges.edges()
+    taken = key_set(num_nodes, existing_edges.union(train_edges).keys)
+    num_edges = len(current)
+
+    accepted = proposed = stalled = 0
+    start = time.time()
+    while accepted < num_swaps and stalled < max_stalled_batches and num_edges >= 2:
+        i = rng.integers(0, num_edges, batch_size)
+        j = rng.integers(0, num_edges, batch_size)
+        proposed += batch_size
+
+        a, b = current[i, 0], current[i, 1]
+        flip = rng.random(batch_size) < 0.5
+        c = np.where(flip, current[j, 1], current[j, 0])
+        d = np.where(flip, current[j, 0], current[j, 1])
+        key1 = np.minimum(a, d) * num_nodes + np.maximum(a, d)
+        key2 = np.minimum(c, b) * num_nodes + np.maximum(c, b)
+
+        ok = (a != c) & (a != d) & (b != c) & (b != d) & (key1 != key2)
+        ok &= ~taken.contains(key1) & ~taken.contains(key2)
+        ok[ok] &= first_use(np.stack([i[ok], j[ok]], axis=1))
+        ok[ok] &= first_use(np.stack([key1[ok], key2[ok]], axis=1))
+
+        selected = np.flatnonzero(ok)[:num_swaps - accepted]
+        current[i[selected]] = keys_to_edges(key1[selected], num_nodes)
+        current[j[selected]] = keys_to_edges(key2[selected], num_nodes)
+        taken.add(np.concatenate([key1[selected], key2[selected]]))
+        accepted += len(selected)
+        stalled = 0 if len(selected) else stalled + 1
+
+    elapsed = max(time.time() - start, 1e-9)
+    stats = {
+        "proposed": proposed,
+        "accepted": accepted,
+        "acceptance_rate": accepted / max(proposed, 1),
+        "swaps_per_sec": accepted / elapsed,
+        "stalled": accepted < num_swaps,
+    }
+    return current, stats
+
+
+def first_use(items):
+    """
+    Given a (P, 2) array of the items each proposal uses, returns a mask of the proposals none of
+    whose items were used by an earlier proposal.
+    """
+    flat = items.ravel()
+    order = np.argsort(flat, kind="stable")
+    is_first = np.ones(len(flat), dtype=bool)
+    is_first[order[1:]] = flat[order[1:]] != flat[order[:-1]]
+    return is_first.reshape(-1, 2).all(axis=1)
     
 
-# Get and return all possible edges based on the number of the nodes in the graph 
-# with constraint (start < end) for all vertices
-def get_all_possible_edges(num_of_nodes):
-    all_edges = set()
-    for i in range(num_of_nodes):
-        for j in range(i + 1, num_of_nodes):
-            all_edges.add((i, j))
-    return all_edges
-
-
 # Get existing edges that are considered by the train, validation, and test set
-# This also includes the negative edges with constraint (start < end) for all vertices
-def get_existing_edges(train, valid, test):
-    existing_edges = train["edge"] + valid["edge"] + valid["edge_neg"] + test["edge"] + test["edge_neg"]
-    new_existing_edges = set()
-    for existing_edge in existing_edges:
-        smaller_node = min(existing_edge[0], existing_edge[1])
-        bigger_node = max(existing_edge[0], existing_edge[1])
-        new_existing_edges.add((smaller_node, bigger_node))
-    return new_existing_edges
+# This also includes the negative edges. The complement of this index (all node pairs that are
+# not existing edges) is never materialized, use EdgeIndex.sample_complement instead
+def get_existing_edges(split_dict, num_nodes) -> EdgeIndex:
+    return EdgeIndex.from_splits(split_dict, num_nodes)
 
 if __name__ == "__main__":
-    
-    # option: random_add(% of edges added), random_remove(% of edges removed), random_swap(num_of_edges_to_swap)
-    # adversial_remove(% of edges removed)
-    perturbation_amount = [0.01, 0.1, 0.25, 0.5, 1.0]
-    perturb_data(method="adversial_add", perturbation_amount=perturbation_amount)
+
+    # e.g. python dataset/perturbation.py --methods random_remove random_add --seeds 1 2 3 --amounts 0.1 0.25 0.5 1.0
+    # Ranked methods store every proportion up to max(amounts); random_swap swaps amount * |E| edge pairs
+    # for every amount, or exactly N edge pairs for every N in --swap-counts if given (e.g. --swap-counts 1000).
+    # Load a level with load_data(perturbation_path=..., perturbation_proportion=...)
+    parser = argparse.ArgumentParser(description='Generate perturbed training graphs')
+    parser.add_argument('--methods', nargs='+', default=["adversial_add"], choices=METHODS)
+    parser.add_argument('--seeds', nargs='+', type=int, default=[123])
+    parser.add_argument('--amounts', nargs='+', type=float, default=[0.01, 0.1, 0.25, 0.5, 1.0],
+                        help="proportions of the training edges")
+    parser.add_argument('--swap-counts', nargs='+', type=int, default=[],
+                        help="absolute numbers of swaps for random_swap (instead of the --amounts proportions)")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    generate_perturbations(args.methods, args.seeds, args.amounts, workers=args.workers, swap_counts=args.swap_counts)
 
 
     # Comment this out to know how many edges exist in train, test, and valid, along with some other info
@@ -0,0 +1,84 @@
+"""
+Prefix-ranked perturbation artifacts.
+
+Removal and addition perturbations only ever take a prefix of one ranked (or shuffled) edge
+order, so instead of writing one csv per perturbation level we store that order once. An
+artifact is a directory holding
+
+    order.npy   (M, 2) int64 edges, most important first
+    meta.json   method, kind ("remove" or "add"), seed, base graph hash, ...
+
+and any proportion p is recovered by slicing the memory-mapped order at k = int(p * E), where E
+is the number of edges in the base training split:
+    - remove: the perturbed train edges are order[k:]
+    - add:    the perturbed train edges are the base edges plus order[:k]
+"""
+
+import json
+import os
+
+import numpy as np
+
+from dataset.graph_store import graph_hash, publish_dir
+
+ARTIFACT_VERSION = 1
+
+
+def save_ranked_perturbation(path:str, order:np.ndarray, kind:str, method:str, seed:int,
+                             base_edges:np.ndarray, num_nodes:int) -> None:
+    """
+    Writes the ranked edge `order` to the artifact directory `path`, replacing any previous
+    artifact there (see publish_dir)
+    """
+    if kind not in ("remove", "add"):
+        raise Exception(f"{kind} is not a supported perturbation kind.")
+
+    order = np.ascontiguousarray(order, dtype=np.int64).reshape(-1, 2)
+    meta = {
+        "version": ARTIFACT_VERSION,
+        "method": method,
+        "kind": kind,
+        "seed": seed,
+        "num_nodes": num_nodes,
+        "num_base_edges": len(base_edges),
+        "base_graph_hash": graph_hash(base_edges, num_nodes),
+        "length": len(order),
+    }
+
+    with publish_dir(path, replace=True) as tmp_path:
+        np.save(os.path.join(tmp_path, "order.npy"), order)
+        with open(os.path.join(tmp_path, "meta.json"), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+
+def is_ranked_perturbation(path) -> bool:
+    return path is not None and os.path.isfile(os.path.join(path, "meta.json"))
+
+
+def load_ranked_perturbation(path:str):
+    """Returns the memory-mapped (copy-on-write) (M, 2) order and the artifact's metadata"""
+    with open(os.path.join(path, "meta.json"), 'r') as f:
+        meta = json.load(f)
+    if meta["version"] != ARTIFACT_VERSION:
+        raise Exception(f"{path} has artifact version {meta['version']}, expected {ARTIFACT_VERSION}")
+    order = np.load(os.path.join(path, "order.npy"), mmap_mode="c")
+    return order, meta
+
+
+def perturbed_edges(path:str, proportion:float, base_edges:np.ndarray, verify=False) -> np.ndarray:
+    """
+    Returns the perturbed train edges for `proportion` of the base edges. Removals are a slice
+    of the memory-mapped order; additions are appended to `base_edges`. With verify=True the
+    base edges are checked against the hash the artifact was generated from.
+    """
+    order, meta = load_ranked_perturbation(path)
+    if verify and graph_hash(base_edges, meta["num_nodes"]) != meta["base_graph_hash"]:
+        raise Exception(f"{path} was not generated from the given base graph")
+
+    k = int(proportion * meta["num_base_edges"])
+    if meta["kind"] == "remove":
+        return order[k:]
+
+    if k > len(order):
+        raise Exception(f"{path} holds {len(order)} added edges, {k} were requested")
+    return np.concatenate([base_edges, order[:k]])
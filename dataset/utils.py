@@ -1,106 +1,96 @@
-import networkx as nx
 from ogb.linkproppred import PygLinkPropPredDataset
-import pandas as pd
-import csv
+import numpy as np
+import os
 import torch
 
+from dataset.graph_store import CACHE_DIR, build_csr, cached_csr, cached_edges, publish_dir
+from dataset.perturbation_store import is_ranked_perturbation, perturbed_edges
+
 NUM_NODES = 4267
+EDGE_PATH = "dataset/ogbl_ddi/raw/edge.csv"
+SPLIT_KEYS = [("train", "edge"), ("valid", "edge"), ("valid", "edge_neg"), ("test", "edge"), ("test", "edge_neg")]
 
-def load_data(test_as_tensor=False, perturbation_path=None):
-    """
-    Loads the OGB-DDI dataset and returns a networkx graph for training, as well as the validation
-    and test edges as a dicitonary e.g. "val" -> "pos" -> [(1, 2), (3, 4), ...]
 
-    If test_as_tensor=True, returns the val/test split as tensor instead of edge list
+def load_graph(perturbation_path=None, backend="csr", perturbation_proportion=None):
     """
-    dataset = PygLinkPropPredDataset(name="ogbl-ddi", root='./dataset/')
+    Loads the training graph (or the perturbed graph at `perturbation_path`).
+
+    With backend="csr" this returns a memory-mapped `CSRGraph` from the on-disk cache, building
+    the cache entry the first time a given edge file is loaded. backend="networkx" builds a
+    networkx graph from that CSR view. In both cases the graph contains all NUM_NODES nodes, even
+    the ones that were disconnected during perturbation.
 
-    if perturbation_path is None:
-        df = pd.read_csv("dataset/ogbl_ddi/raw/edge.csv", names=["source", "target"])
-        G = nx.from_pandas_edgelist(df)
+    perturbation_path is either a csv of train edges or a ranked perturbation artifact (see
+    dataset/perturbation_store.py), in which case perturbation_proportion picks the level.
+    """
+    if is_ranked_perturbation(perturbation_path):
+        edges = load_perturbed_edges(perturbation_path, perturbation_proportion)
+        graph = build_csr(edges, NUM_NODES)
     else:
-        df = pd.read_csv(perturbation_path, names=["source", "target"])
-        G = nx.from_pandas_edgelist(df)
+        edge_path = EDGE_PATH if perturbation_path is None else perturbation_path
+        graph = cached_csr(edge_path, NUM_NODES)
+
+    match backend:
+        case "csr":
+            return graph
+        case "networkx":
+            return graph.to_networkx()
+        case _:
+            raise Exception(f"{backend} is not a supported graph backend.")
+
+
+def load_perturbed_edges(perturbation_path, perturbation_proportion):
+    """Train edges for one level of a ranked perturbation artifact"""
+    if perturbation_proportion is None:
+        raise Exception(f"{perturbation_path} is a ranked perturbation, a proportion is required")
+    base_edges = load_splits()["train"]["edge"]
+    return perturbed_edges(perturbation_path, perturbation_proportion, base_edges)
+
+
+def load_splits(as_tensor=False, perturbation_path=None, cache_dir=CACHE_DIR, perturbation_proportion=None):
+    """
+    Returns the train/valid/test edge splits as a dictionary e.g. "valid" -> "edge_neg" -> (E, 2)
+    int64 array. The splits are converted from the OGB dataset once and memory-mapped from
+    `cache_dir` afterwards. If perturbation_path is given, the train edges come from that csv
+    (or ranked perturbation artifact at perturbation_proportion).
+
+    If as_tensor=True, every split is returned as a tensor sharing memory with the array
+    """
+    path = os.path.join(cache_dir, "splits")
+    if not os.path.isdir(path):
+        dataset = PygLinkPropPredDataset(name="ogbl-ddi", root='./dataset/')
+        split_edge = dataset.get_edge_split()
 
+        # processes starting on a cold cache may all build it; the first one published is kept
+        with publish_dir(path) as tmp_path:
+            for split, key in SPLIT_KEYS:
+                edges = split_edge[split][key].numpy().astype(np.int64)
+                np.save(os.path.join(tmp_path, f"{split}_{key}.npy"), edges)
+
+    split_dict = {}
+    for split, key in SPLIT_KEYS:
+        if split == "train" and is_ranked_perturbation(perturbation_path):
+            edges = load_perturbed_edges(perturbation_path, perturbation_proportion)
+        elif split == "train" and perturbation_path is not None:
+            edges = cached_edges(perturbation_path, NUM_NODES, cache_dir)
+        else:
+            # copy-on-write mapping so torch.from_numpy gets a writable buffer without a copy
+            edges = np.load(os.path.join(path, f"{split}_{key}.npy"), mmap_mode="c")
+        split_dict.setdefault(split, {})[key] = torch.from_numpy(edges) if as_tensor else edges
+    return split_dict
+
+
+def load_data(test_as_tensor=False, perturbation_path=None, perturbation_proportion=None):
+    """
+    Loads the OGB-DDI dataset and returns a networkx graph for training, as well as the train,
+    validation and test edges as a dicitonary e.g. "valid" -> "edge" -> (E, 2) array
+
+    If test_as_tensor=True, returns the splits as tensors instead of numpy arrays.
+    perturbation_proportion is only used when perturbation_path is a ranked perturbation artifact.
+    """
     # TODO: This is not a great final solution. When applying link prediction to graphs, we
     #       don't consider nodes with no neighbors at all
-    # Add back all nodes that were disconnected during perturbation
-    for node in range(NUM_NODES):
-        if not G.has_node(node):
-            G.add_node(node)
-        
-
-    split_edge = dataset.get_edge_split()
-
-    if perturbation_path is None:
-        if not test_as_tensor:
-            split_dict = {
-                "train": {
-                    "edge": split_edge["train"]["edge"].tolist(),
-                },
-                "valid": {
-                    "edge": split_edge["valid"]["edge"].tolist(),
-                    "edge_neg": split_edge["valid"]["edge_neg"].tolist()
-                },
-                "test": {
-                    "edge": split_edge["test"]["edge"].tolist(),
-                    "edge_neg": split_edge["test"]["edge_neg"].tolist()
-                },
-            }
-        else:
-            split_dict = {
-                "train": {
-                    "edge": split_edge["train"]["edge"],
-                },
-                "valid": {
-                    "edge": split_edge["valid"]["edge"],
-                    "edge_neg": split_edge["valid"]["edge_neg"]
-                },
-                "test": {
-                    "edge": split_edge["test"]["edge"],
-                    "edge_neg": split_edge["test"]["edge_neg"]
-                },
-            }
-        return G, split_dict
-    else:
-        train_edges = []
-        with open(perturbation_path, 'r') as csv_file:
-            csv_reader = csv.reader(csv_file)
-            for row in csv_reader:
-                # print(f"`{row}`")
-                if len(row) == 0:   # skip blank lines
-                    continue
-                train_edges.append([int(row[0]), int(row[1])])
-        csv_file.close()
-
-        if not test_as_tensor:
-            split_dict = {
-                "train": {
-                    "edge": train_edges,
-                },
-                "valid": {
-                    "edge": split_edge["valid"]["edge"].tolist(),
-                    "edge_neg": split_edge["valid"]["edge_neg"].tolist()
-                },
-                "test": {
-                    "edge": split_edge["test"]["edge"].tolist(),
-                    "edge_neg": split_edge["test"]["edge_neg"].tolist()
-                },
-            }
-        else:
-            split_dict = {
-                "train": {
-                    "edge": torch.Tensor(train_edges), # TODO: not too sure about this, need to double check
-                },
-                "valid": {
-                    "edge": split_edge["valid"]["edge"],
-                    "edge_neg": split_edge["valid"]["edge_neg"]
-                },
-                "test": {
-                    "edge": split_edge["test"]["edge"],
-                    "edge_neg": split_edge["test"]["edge_neg"]
-                },
-            }
-        return G, split_dict
-    
-        
+    G = load_graph(perturbation_path, backend="networkx", perturbation_proportion=perturbation_proportion)
+
+    split_dict = load_splits(test_as_tensor, perturbation_path, perturbation_proportion=perturbation_proportion)
+    return G, split_dict
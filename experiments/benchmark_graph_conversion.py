@@ -0,0 +1,63 @@
+import sys
+import os
+sys.path.append(os.getcwd())
+#####################################################################
+
+import torch
+import time
+
+from dataset.utils import load_graph
+from dataset.graph_convert import graph_tensors
+
+"""
+Benchmarks the vectorized graph -> tensor conversion in dataset/graph_convert.py against the
+adjacency loop the torch models used to run in train()
+"""
+
+
+def loop_graph_tensors(graph):
+    pos_list = []
+    edge_list = [[], []]
+    seen_nodes = set()
+
+    for node, nbr_dict in graph.adjacency():
+        seen_nodes.add(node)
+        for n in nbr_dict.keys():
+            if n not in seen_nodes:
+                pos_list.append([node, n])
+            edge_list[0].append(int(node))
+            edge_list[0].append(int(n))
+            edge_list[1].append(int(n))
+            edge_list[1].append(int(node))
+
+    return torch.tensor(pos_list), torch.tensor(edge_list)
+
+
+def main():
+    csr = load_graph(backend="csr")
+    G = csr.to_networkx()
+
+    start = time.time()
+    loop_pos, loop_index = loop_graph_tensors(G)
+    loop_time = time.time() - start
+
+    start = time.time()
+    nx_pos, nx_index = graph_tensors(G)
+    nx_time = time.time() - start
+
+    start = time.time()
+    csr_pos, csr_index = graph_tensors(csr)
+    csr_time = time.time() - start
+
+    # The loop lists every directed edge twice, the CSR conversion once
+    assert torch.equal(torch.unique(loop_index, dim=1), csr_index)
+    assert torch.equal(torch.unique(loop_pos.sort(dim=1).values, dim=0), csr_pos)
+    assert torch.equal(nx_index, csr_index)
+
+    print(f"adjacency loop:        {round(loop_time, 3)}s")
+    print(f"vectorized (networkx): {round(nx_time, 3)}s")
+    print(f"vectorized (csr):      {round(csr_time, 3)}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import sys
+import os
+sys.path.append(os.getcwd())
+#####################################################################
+
+import tempfile
+import torch
+
+from dataset.utils import load_graph, load_splits
+from models.GraphSAGE import GraphSAGE
+
+"""
+Compares full-graph and neighbor-sampled GraphSAGE training on ogbl-ddi: per-epoch wall time
+and validation Hits@20 after every epoch
+"""
+
+EPOCHS = 5
+
+
+def run(sampling, graph, val_edges):
+    torch.manual_seed(0)
+    model = GraphSAGE()
+    with tempfile.TemporaryDirectory() as out_path:
+        model.train(graph, val_edges, epochs=EPOCHS, sampling=sampling, val_start_epoch=0, out_path=out_path)
+    return model.history
+
+
+def main():
+    graph = load_graph(backend="csr")
+    val_edges = load_splits(as_tensor=True)["valid"]
+
+    histories = {sampling: run(sampling, graph, val_edges) for sampling in ["full", "neighbor"]}
+
+    print(f"{'epoch':>5} | {'full time':>9} {'full hits@20':>12} | {'neighbor time':>13} {'neighbor hits@20':>16}")
+    for full, neighbor in zip(histories["full"], histories["neighbor"]):
+        print(f"{full['epoch']:>5} | {full['time']:>8.2f}s {full['result']['Hits@20']:>12.4f} | "
+              f"{neighbor['time']:>12.2f}s {neighbor['result']['Hits@20']:>16.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import sys
+import os
+sys.path.append(os.getcwd())
+#####################################################################
+
+import numpy as np
+import torch
+import time
+from torch.utils.data import DataLoader
+
+from dataset.utils import load_splits
+import models.Inference as Inference
+from models.RandomWalkMLP import LinkPredictor
+
+"""
+Benchmarks scoring throughput (edges/sec) of the shared torch inference runtime in
+models/Inference.py against the previous per-model loops (autograd on, per-batch tensors
+concatenated at the end, and RandomWalkMLP's default batch_size=1) on the ogbl-ddi valid/test
+edges, with the link predictor the torch models use on 256-d node embeddings
+"""
+
+NUM_NODES = 4267
+EMB_DIM = 256
+HIDDEN_DIM = 256
+NUM_LAYERS = 3
+SINGLE_EDGE_LIMIT = 20_000   # the batch_size=1 loop is only timed on a prefix of the edges
+
+
+def legacy_scores(predictor, node_emb, edge_list, batch_size):
+    """The loop the models used before models.Inference"""
+    predictor.eval()
+    edges = torch.as_tensor(edge_list)
+    preds = []
+    for perm in DataLoader(range(edges.size(0)), batch_size):
+        edge = edges[perm].t()
+        preds += [predictor(node_emb[edge[0]], node_emb[edge[1]]).view(-1).cpu()]
+    return torch.cat(preds, dim=0).detach().numpy()
+
+
+def throughput(score, edges):
+    score(edges[:1000])   # warmup
+    start = time.time()
+    scores = score(edges)
+    return scores, len(edges) / (time.time() - start)
+
+
+def main():
+    split_dict = load_splits()
+    edges = np.concatenate([split_dict[split][key] for split in ["valid", "test"] for key in ["edge", "edge_neg"]])
+    edges = np.asarray(edges, dtype=np.int64)
+
+    torch.manual_seed(0)
+    predictor = LinkPredictor(EMB_DIM, HIDDEN_DIM, 1, NUM_LAYERS, dropout=0.5)
+    node_emb = torch.randn(NUM_NODES, EMB_DIM)
+    budget_batch = Inference.batch_size_for(predictor, EMB_DIM)
+    print(f"{len(edges)} edges, memory budget {Inference.MEMORY_BUDGET / 2**20:.0f} MB -> batch size {budget_batch}")
+
+    runs = [
+        ("legacy, batch_size=1", lambda e: legacy_scores(predictor, node_emb, e, 1), edges[:SINGLE_EDGE_LIMIT]),
+        ("legacy, batch_size=65536", lambda e: legacy_scores(predictor, node_emb, e, 64 * 1024), edges),
+        ("Inference.score_edges", lambda e: Inference.score_edges(predictor, node_emb, e), edges),
+        ("Inference.iter_scores", lambda e: np.concatenate(list(Inference.iter_scores(predictor, node_emb, e))), edges),
+    ]
+    reference = Inference.score_edges(predictor, node_emb, edges)
+    for name, score, run_edges in runs:
+        scores, rate = throughput(score, run_edges)
+        assert np.allclose(scores, reference[:len(run_edges)], atol=1e-6), name
+        print(f"{name:>26}: {rate:>12,.0f} edges/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import sys
+import os
+sys.path.append(os.getcwd())
+#####################################################################
+
+import torch
+import time
+
+from dataset.utils import load_graph
+from dataset.graph_convert import edge_index, sparse_adj
+from models.GraphSAGE import GNNStack
+
+"""
+Benchmarks one forward + backward pass of the GraphSAGE GNNStack on the ogbl-ddi training graph
+with COO `edge_index` message passing against the CSR sparse adjacency (`adj_t`)
+"""
+
+NODE_EMB_DIM = 256
+HIDDEN_DIM = 256
+NUM_LAYERS = 2
+REPEATS = 5
+
+
+def time_passes(model, x, adj):
+    times = []
+    for _ in range(REPEATS + 1):
+        start = time.time()
+        out = model(x, adj)
+        out.sum().backward()
+        times.append(time.time() - start)
+    return out.detach(), min(times[1:])   # first pass is a warmup
+
+
+def main():
+    graph = load_graph(backend="csr")
+    coo = edge_index(graph)
+    adj_t = sparse_adj(graph)
+    print(f"graph: {graph.number_of_nodes()} nodes, {coo.shape[1]} directed edges, adj_t is a {type(adj_t).__name__} ({adj_t.layout if torch.is_tensor(adj_t) else 'torch_sparse'})")
+
+    torch.manual_seed(0)
+    model = GNNStack(NODE_EMB_DIM, HIDDEN_DIM, HIDDEN_DIM, NUM_LAYERS, dropout=0.0, emb=True)
+    x = torch.randn(graph.number_of_nodes(), NODE_EMB_DIM, requires_grad=True)
+
+    coo_out, coo_time = time_passes(model, x, coo)
+    csr_out, csr_time = time_passes(model, x, adj_t)
+    assert torch.allclose(coo_out, csr_out, atol=1e-4)
+
+    print(f"edge_index (COO scatter): {coo_time:.3f}s per forward + backward")
+    print(f"adj_t (CSR spmm):         {csr_time:.3f}s per forward + backward ({coo_time / csr_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
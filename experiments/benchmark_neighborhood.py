@@ -0,0 +1,63 @@
+import sys
+import os
+sys.path.append(os.getcwd())
+#####################################################################
+
+import numpy as np
+import time
+
+from dataset.utils import load_graph, load_splits
+from models.Neighborhood import BitsetAdjacency, CommonNeighborCounter, select_backend
+
+"""
+Benchmarks the common neighbor backends in models/Neighborhood.py (scipy CSR row gathers,
+bit-packed popcounts and a dense BLAS A @ A) on the ogbl-ddi training graph, scoring the
+valid/test edges and increasingly large batches of random pairs
+"""
+
+BACKENDS = ["csr", "bitset", "dense"]
+NUM_RANDOM = [10_000, 100_000, 1_000_000]
+
+
+def time_backend(adj, backend, queries):
+    start = time.time()
+    counter = CommonNeighborCounter(adj, backend)
+    setup = time.time() - start
+
+    times = []
+    results = []
+    for edges in queries:
+        start = time.time()
+        results.append(counter(edges))
+        times.append(time.time() - start)
+    return setup, times, results
+
+
+def main():
+    adj = load_graph(backend="csr").to_scipy()
+    split_dict = load_splits()
+    num_nodes = adj.shape[0]
+    print(f"graph: {num_nodes} nodes, {adj.nnz // 2} edges, "
+          f"bitset {BitsetAdjacency(adj).rows.nbytes / 2**20:.1f} MB, dense A^2 {4 * num_nodes**2 / 2**20:.1f} MB")
+
+    rng = np.random.default_rng(0)
+    eval_edges = np.concatenate([split_dict[split][key] for split in ["valid", "test"] for key in ["edge", "edge_neg"]])
+    queries = [np.asarray(eval_edges, dtype=np.int64)]
+    queries += [rng.integers(0, num_nodes, size=(n, 2)) for n in NUM_RANDOM]
+    names = [f"valid+test ({len(queries[0])})"] + [f"random ({n})" for n in NUM_RANDOM]
+
+    reference = None
+    for backend in BACKENDS:
+        setup, times, results = time_backend(adj, backend, queries)
+        if reference is None:
+            reference = results
+        assert all(np.array_equal(a, b) for a, b in zip(results, reference)), backend
+
+        print(f"{backend:>7}: setup {setup:.3f}s | " + " | ".join(f"{name} {t:.3f}s" for name, t in zip(names, times)))
+
+    for num_queries in [None] + [len(q) for q in queries]:
+        print(f"auto backend for {num_queries} queries: {select_backend(adj, num_queries)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import sys
+import os
+sys.path.append(os.getcwd())
+#####################################################################
+
+import numpy as np
+import torch
+import time
+from torch.utils.data import DataLoader
+
+from dataset.utils import load_graph, load_splits
+from dataset.graph_convert import graph_tensors
+from models.NegativeSampler import NegativeSampler
+from models.RandomWalkMLP import LinkPredictor, RandomWalkMLP, hadamard_features, train
+
+"""
+Benchmarks one RandomWalkMLP epoch (training + validation scoring) on the ogbl-ddi training graph
+with random 256-d frozen embeddings: the previous loop (DataLoader batches, embedding gathers on
+every batch and for every validation edge) against the frozen-embedding fast path (randperm
+batches, precomputed validation Hadamard features) with and without cached positive features
+"""
+
+EMB_DIM = 256
+
+
+def legacy_train(predictor, node_embs, pos_train_edge, negative_sampler, optimizer, batch_size):
+    """The training loop before the frozen-embedding fast path"""
+    predictor.train()
+    batches = list(DataLoader(range(pos_train_edge.size(0)), batch_size, shuffle=True))
+    for perm, neg_edge in zip(batches, negative_sampler.epoch(batches, pos_train_edge)):
+        optimizer.zero_grad()
+        edge = pos_train_edge[perm].t()
+        pos_out = predictor(node_embs[edge[0]], node_embs[edge[1]])
+        neg_out = predictor(node_embs[neg_edge[0]], node_embs[neg_edge[1]])
+        loss = -torch.log(pos_out + 1e-15).mean() - torch.log(1 - neg_out + 1e-15).mean()
+        loss.backward()
+        optimizer.step()
+
+
+def main():
+    graph = load_graph(backend="csr")
+    split_dict = load_splits(as_tensor=True)
+    pos_train_edge, _ = graph_tensors(graph)
+    val_edges = split_dict["valid"]
+
+    torch.manual_seed(0)
+    model = RandomWalkMLP()
+    model.node_embs = torch.randn(graph.number_of_nodes(), EMB_DIM)
+    model.link_predictor = LinkPredictor(EMB_DIM, model.hidden_channels, 1, model.num_layers, model.dropout)
+    optimizer = torch.optim.Adam(model.link_predictor.parameters(), lr=model.lr)
+    sampler = NegativeSampler(graph, seed=0)
+    print(f"{len(pos_train_edge)} positive edges, {len(val_edges['edge']) + len(val_edges['edge_neg'])} validation edges")
+
+    start = time.time()
+    legacy_train(model.link_predictor, model.node_embs, pos_train_edge, sampler, optimizer, model.batch_size)
+    train_time = time.time() - start
+    start = time.time()
+    reference = [model.score_edges(val_edges[key]) for key in ["edge", "edge_neg"]]
+    print(f"{'legacy':>22}: train {train_time:.2f}s | validation {time.time() - start:.2f}s")
+
+    start = time.time()
+    val_features = {key: hadamard_features(model.node_embs, val_edges[key]) for key in ["edge", "edge_neg"]}
+    pos_features = hadamard_features(model.node_embs, pos_train_edge)
+    print(f"{'feature buffers':>22}: {time.time() - start:.2f}s once, "
+          f"{sum(f.nbytes for f in val_features.values()) / 2**20:.0f} MB validation + {pos_features.nbytes / 2**20:.0f} MB positives")
+
+    start = time.time()
+    scores = [model.score_features(val_features[key]) for key in ["edge", "edge_neg"]]
+    val_time = time.time() - start
+    assert all(np.allclose(a, b, atol=1e-6) for a, b in zip(scores, reference))
+
+    for name, features in [("fast path", None), ("fast path + positives", pos_features)]:
+        start = time.time()
+        train(model.link_predictor, model.node_embs, pos_train_edge, sampler, optimizer, model.batch_size, pos_features=features)
+        print(f"{name:>22}: train {time.time() - start:.2f}s | validation {val_time:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import sys
+import os
+sys.path.append(os.getcwd())
+#####################################################################
+
+import numpy as np
+import time
+
+from models.Evaluation import SampledValidation, evaluate
+
+"""
+Compares full per-epoch validation with SampledValidation on simulated 200-epoch training runs
+validated from epoch 100 (GraphSAGE's default) at ogbl-ddi validation size (~133k positive and
+~100k negative edges). Every epoch's scores are a fixed per-edge difficulty plus a signal that
+plateaus with noise, so successive epochs are close and the best one is not obvious. Subsamples of 20% of both edge sets and of
+20% of the positives with all the negatives are compared. Reports the best epoch each strategy selects,
+how often the sampled strategy escalated to the full set, and the fraction of validation edges
+scored (the model's scoring cost, which dominates validation) and evaluation time.
+"""
+
+NUM_POS = 133_489
+NUM_NEG = 101_882
+EPOCHS = 200
+VAL_START_EPOCH = 100   # GraphSAGE only validates the second half of training by default
+RUNS = 5
+
+
+def simulate(seed):
+    """Per-epoch (positive scores, negative scores) of one simulated run"""
+    rng = np.random.default_rng(seed)
+    pos_difficulty = rng.normal(0.0, 1.0, NUM_POS).astype(np.float32)
+    neg_difficulty = rng.normal(0.0, 1.0, NUM_NEG).astype(np.float32)
+    # noisy learning curve of the separation between positives and negatives: a rise, a plateau
+    # and slow overfitting
+    epochs = np.arange(EPOCHS)
+    signal = 3.5 * (1 - np.exp(-epochs / 30)) - 0.002 * epochs + rng.normal(0.0, 0.08, EPOCHS)
+    for e in range(VAL_START_EPOCH, EPOCHS):
+        yield (pos_difficulty + signal[e] + rng.normal(0.0, 0.3, NUM_POS).astype(np.float32),
+               neg_difficulty + rng.normal(0.0, 0.3, NUM_NEG).astype(np.float32))
+
+
+def run(seed, validator):
+    full_best, sampled_best = (-1, 0.0), (-1, 0.0)
+    full_time, sampled_time, scored, escalations, new_bests = 0.0, 0.0, 0, 0, 0
+    for e, (pos, neg) in enumerate(simulate(seed), VAL_START_EPOCH):
+        start = time.time()
+        hits = evaluate(pos, neg, ks=[20], ranks=False)["hits@20"]
+        full_time += time.time() - start
+        if hits > full_best[1]:
+            full_best = (e, hits)
+            new_bests += 1
+
+        edges = {"edge": pos, "edge_neg": neg}
+        calls = []
+        def score(key, index):
+            calls.append(len(edges[key]) if index is None else len(index))
+            return edges[key] if index is None else edges[key][index]
+
+        start = time.time()
+        result = validator.validate(score, sampled_best[1])
+        sampled_time += time.time() - start
+        scored += sum(calls)
+        escalations += result["full"]
+        if result.get("Hits@20", 0.0) > sampled_best[1]:
+            sampled_best = (e, result["Hits@20"])
+    return full_best, sampled_best, new_bests, escalations, scored / ((EPOCHS - VAL_START_EPOCH) * (NUM_POS + NUM_NEG)), full_time, sampled_time
+
+
+def main():
+    for name, kwargs in [("20% of both", dict(fraction=0.2, neg_fraction=0.2)), ("20% pos, all neg", dict(fraction=0.2, neg_fraction=1.0))]:
+        for seed in range(RUNS):
+            validator = SampledValidation.uniform(NUM_POS, NUM_NEG, seed=seed, **kwargs)
+            full_best, sampled_best, new_bests, escalations, fraction, full_time, sampled_time = run(seed, validator)
+            print(f"{name}, run {seed}: best epoch full {full_best[0]} ({full_best[1]:.4f}) | sampled {sampled_best[0]} "
+                  f"({sampled_best[1]:.4f}) | {escalations}/{EPOCHS - VAL_START_EPOCH} escalations for {new_bests} new bests | "
+                  f"{fraction:.0%} of edges scored | evaluation {full_time:.2f}s full vs {sampled_time:.2f}s sampled")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,8 @@ import os
 sys.path.append(os.getcwd())
 #####################################################################
 
-from ogb.linkproppred import PygLinkPropPredDataset, Evaluator
+from ogb.linkproppred import PygLinkPropPredDataset
+from models.Evaluation import evaluate
 from models.Neighborhood import CommonNeighbor
 import pandas as pd
 import numpy as np
@@ -74,32 +75,21 @@ def load_test():
     pos_test_pred = model.score_edges(split_edge["test"]["edge"].tolist())
     neg_test_pred = model.score_edges(split_edge["test"]["edge_neg"].tolist())
 
-    evaluator = Evaluator(name='ogbl-ddi')
     results = {}
 
     # metrics on validation test
+    metrics = evaluate(pos_valid_preds, neg_valid_preds, ks=[20, 50, 100])
     for K in [20, 50, 100]:
-        evaluator.K = K
-        hits = evaluator.eval({
-            'y_pred_pos': np.array(pos_valid_preds),
-            'y_pred_neg': np.array(neg_valid_preds),
-        })[f'hits@{K}']
-
-        results[f'Hits@{K}'] = hits
+        results[f'Hits@{K}'] = metrics[f'hits@{K}']
     
     with open("results/commonneighbor.txt", 'w') as f:
         f.write("On validation set, model achieves:\n")
         f.write(str(results) + "\n\n")
 
     # metrics on test test
+    metrics = evaluate(pos_test_pred, neg_test_pred, ks=[20, 50, 100])
     for K in [20, 50, 100]:
-        evaluator.K = K
-        hits = evaluator.eval({
-            'y_pred_pos': np.array(pos_test_pred),
-            'y_pred_neg': np.array(neg_test_pred),
-        })[f'hits@{K}']
-
-        results[f'Hits@{K}'] = hits
+        results[f'Hits@{K}'] = metrics[f'hits@{K}']
     
     with open('results/commonneighbor.txt', 'a') as f:
         f.write("On test set, model achieves:\n")
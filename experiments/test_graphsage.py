@@ -3,7 +3,8 @@ import os
 sys.path.append(os.getcwd())
 #####################################################################
 
-from ogb.linkproppred import PygLinkPropPredDataset, Evaluator
+from ogb.linkproppred import PygLinkPropPredDataset
+from models.Evaluation import evaluate
 from models.GraphSAGE import GraphSAGE
 import pandas as pd
 import numpy as np
@@ -70,28 +71,16 @@ def get_results():
         pos_test_pred = model.score_edges(split_edge["test"]["edge"])
         neg_test_pred = model.score_edges(split_edge["test"]["edge_neg"])
 
-        evaluator = Evaluator(name='ogbl-ddi')
-
         # metrics on validation test
+        metrics = evaluate(pos_valid_preds, neg_valid_preds, ks=[20, 50, 100])
         for K in [20, 50, 100]:
-            evaluator.K = K
-            hits = evaluator.eval({
-                'y_pred_pos': np.array(pos_valid_preds),
-                'y_pred_neg': np.array(neg_valid_preds),
-            })[f'hits@{K}']
-
-            results_val[f'Hits@{K}'].append(hits)
+            results_val[f'Hits@{K}'].append(metrics[f'hits@{K}'])
 
         
         # metrics on test test
+        metrics = evaluate(pos_test_pred, neg_test_pred, ks=[20, 50, 100])
         for K in [20, 50, 100]:
-            evaluator.K = K
-            hits = evaluator.eval({
-                'y_pred_pos': np.array(pos_test_pred),
-                'y_pred_neg': np.array(neg_test_pred),
-            })[f'hits@{K}']
-
-            results_test[f'Hits@{K}'].append(hits)
+            results_test[f'Hits@{K}'].append(metrics[f'hits@{K}'])
     
 
         print(ep)
@@ -156,20 +145,14 @@ def load_test():
     pos_test_pred = model.score_edges(split_edge["test"]["edge"])
     neg_test_pred = model.score_edges(split_edge["test"]["edge_neg"])
 
-    evaluator = Evaluator(name='ogbl-ddi')
     results = {}
 
     print("\tRunning evaluator on val...")
 
     # metrics on validation test
+    metrics = evaluate(pos_valid_preds, neg_valid_preds, ks=[20, 50, 100])
     for K in [20, 50, 100]:
-        evaluator.K = K
-        hits = evaluator.eval({
-            'y_pred_pos': np.array(pos_valid_preds),
-            'y_pred_neg': np.array(neg_valid_preds),
-        })[f'hits@{K}']
-
-        results[f'Hits@{K}'] = hits
+        results[f'Hits@{K}'] = metrics[f'hits@{K}']
 
     print("On val set, model achieves:\n")
     print(str(results))
@@ -181,14 +164,9 @@ def load_test():
     print("\tRunning evaluator on test...")
 
     # metrics on test test
+    metrics = evaluate(pos_test_pred, neg_test_pred, ks=[20, 50, 100])
     for K in [20, 50, 100]:
-        evaluator.K = K
-        hits = evaluator.eval({
-            'y_pred_pos': np.array(pos_test_pred),
-            'y_pred_neg': np.array(neg_test_pred),
-        })[f'hits@{K}']
-
-        results[f'Hits@{K}'] = hits
+        results[f'Hits@{K}'] = metrics[f'hits@{K}']
 
     print("On test set, model achieves:\n")
     print(str(results))
@@ -3,13 +3,15 @@ import os
 sys.path.append(os.getcwd())
 #####################################################################
 
-from ogb.linkproppred import PygLinkPropPredDataset, Evaluator
+from ogb.linkproppred import PygLinkPropPredDataset
+from models.Evaluation import evaluate
 from models.Neighborhood import JaccardSimilarity
 import pandas as pd
 import numpy as np
 import networkx as nx
 import time
 from dataset.utils import load_data
+from dataset.perturbation import output_path
 
 TRAIN = True
 
@@ -21,8 +23,7 @@ def main():
     start = time.time()
 
     if TRAIN:
-        CSV_path = "perturbation/random_remove_0.25.csv"
-        train_test(CSV_path)
+        train_test(output_path("random_remove", seed=123), 0.25)
     else:
         load_test()
 
@@ -30,13 +31,13 @@ def main():
     print(f"Script took {round((end - start) / 60, 2)} minutes to run")
 
 
-def train_test(CSV_path):
+def train_test(perturbation_path, perturbation_proportion):
     """
     Trains and saves model using abstract class methods
     """
     print("=> Preparing dataset...")
     PygLinkPropPredDataset(name="ogbl-ddi", root='./dataset/')
-    G, _ = load_data(perturbation_path=CSV_path)
+    G, _ = load_data(perturbation_path=perturbation_path, perturbation_proportion=perturbation_proportion)
 
     print("=> Initializing Jaccard model...")
     model = JaccardSimilarity()
@@ -74,32 +75,21 @@ def load_test():
     pos_test_pred = model.score_edges(split_edge["test"]["edge"].tolist())
     neg_test_pred = model.score_edges(split_edge["test"]["edge_neg"].tolist())
 
-    evaluator = Evaluator(name='ogbl-ddi')
     results = {}
 
     # metrics on validation test
+    metrics = evaluate(pos_valid_preds, neg_valid_preds, ks=[20, 50, 100])
     for K in [20, 50, 100]:
-        evaluator.K = K
-        hits = evaluator.eval({
-            'y_pred_pos': np.array(pos_valid_preds),
-            'y_pred_neg': np.array(neg_valid_preds),
-        })[f'hits@{K}']
-
-        results[f'Hits@{K}'] = hits
+        results[f'Hits@{K}'] = metrics[f'hits@{K}']
     
     with open("results/jaccard.txt", 'w') as f:
         f.write("On validation set, model achieves:\n")
         f.write(str(results) + "\n\n")
 
     # metrics on test test
+    metrics = evaluate(pos_test_pred, neg_test_pred, ks=[20, 50, 100])
     for K in [20, 50, 100]:
-        evaluator.K = K
-        hits = evaluator.eval({
-            'y_pred_pos': np.array(pos_test_pred),
-            'y_pred_neg': np.array(neg_test_pred),
-        })[f'hits@{K}']
-
-        results[f'Hits@{K}'] = hits
+        results[f'Hits@{K}'] = metrics[f'hits@{K}']
     
     with open('results/jaccard.txt', 'a') as f:
         f.write("On test set, model achieves:\n")
@@ -6,17 +6,19 @@ sys.path.append(os.getcwd())
 from models.GraphSAGE import GraphSAGE
 from models.Neighborhood import CommonNeighbor, AdamicAdar, RuntimeCN
 from models.RandomWalkMLP import RandomWalkMLP
+from models.Checkpoint import best_checkpoint
 
 # NOTE: Need to add this to the conda env
 # from models.RandomWalk import Node2Vec
 
-from ogb.linkproppred import Evaluator
+from models.Evaluation import evaluate
 
 import pandas as pd
 import numpy as np
 import networkx as nx
 
 from dataset.utils import load_data
+from dataset.perturbation import DETERMINISTIC_METHODS, output_path
 import time
 
 TRAIN = True
@@ -36,11 +38,11 @@ model_types = [
 # TODO: Add seems to be getting destroyed. Retry these with remove instead of add
 # perturb_list = [("remove", 0.1), ("add", 0.1)]
 perturb_list = [("add", 0.0)]
+# seed of the random_* perturbations (the adversial ones are deterministic)
+PERTURBATION_SEED = 123
 
 def main():
 
-    perturb_dir = "dataset/perturbation"
-
     # need this for validation set
     _, split_edge_tensor = load_data(test_as_tensor=True)
     _, split_edge_list = load_data()
@@ -48,12 +50,13 @@ def main():
     for perturb_type in ["adversial"]:
         for change, prop in perturb_list:
             
-            data_path = perturb_dir + f"/{perturb_type}_{change}_{prop}.csv"
+            method = f"{perturb_type}_{change}"
+            seed = None if method in DETERMINISTIC_METHODS else PERTURBATION_SEED
 
             if prop == 0.0:
                 G, _ = load_data()
             else:
-                G, _ = load_data(perturbation_path=data_path)
+                G, _ = load_data(perturbation_path=output_path(method, seed), perturbation_proportion=prop)
 
             for LinkPredictor, name in model_types:
                 start = time.time()
@@ -73,14 +76,12 @@ def main():
                         #       that for testing
                         load_path = f"{out_path}/gnn_trained"
                         print("=>", load_path)
-                        if not os.path.isdir(f"{load_path}"):
-                            print(f"\n\nDoes not exist: {load_path}\n")
+                        best_path = best_checkpoint(load_path)
+                        if best_path is None:
+                            print(f"\n\nNo checkpoints in: {load_path}\n")
                             continue
-                        path_list = os.listdir(load_path)
-                        # Use string formatting to get the latest epoch
-                        path_list.sort(key = lambda pth: int(pth[2:-7]))
-                        print("\tBest model:", path_list[-1])
-                        model.load_model(f"{load_path}/{path_list[-1]}")
+                        print("\tBest model:", best_path)
+                        model.load_model(best_path)
                         model.save_model(out_path)
 
                     elif name == "randomwalk":
@@ -88,14 +89,12 @@ def main():
                         model.train(graph=G, val_edges=split_edge_tensor["valid"], embedding_path=embedding_path, out_path=out_path)
                         load_path = f"{out_path}/randomwalk_trained"
                         print("=>", load_path)
-                        if not os.path.isdir(f"{load_path}"):
-                            print(f"\n\nDoes not exist: {load_path}\n")
+                        best_path = best_checkpoint(load_path)
+                        if best_path is None:
+                            print(f"\n\nNo checkpoints in: {load_path}\n")
                             continue
-                        path_list = os.listdir(load_path)
-                        # Use string formatting to get the latest epoch
-                        path_list.sort(key = lambda pth: int(pth[2:-7]))
-                        print("\tBest model:", path_list[-1])
-                        model.load_model(f"{load_path}/{path_list[-1]}")
+                        print("\tBest model:", best_path)
+                        model.load_model(best_path)
                         model.save_model(out_path)
 
                     else:
@@ -118,18 +117,12 @@ def main():
                 neg_test_pred = model.score_edges(split_edge["test"]["edge_neg"])
                 print("\tEdges scored")
 
-                evaluator = Evaluator(name='ogbl-ddi')
                 results = {}
 
                 # metrics on validation test
+                metrics = evaluate(pos_valid_preds, neg_valid_preds, ks=[20, 50, 100])
                 for K in [20, 50, 100]:
-                    evaluator.K = K
-                    hits = evaluator.eval({
-                        'y_pred_pos': np.array(pos_valid_preds),
-                        'y_pred_neg': np.array(neg_valid_preds),
-                    })[f'hits@{K}']
-
-                    results[f'Hits@{K}'] = hits
+                    results[f'Hits@{K}'] = metrics[f'hits@{K}']
 
                 print("\tVal scoring evaluated")
                 print(results)
@@ -139,14 +132,9 @@ def main():
                     f.write(str(results) + "\n\n")
 
                 # metrics on test test
+                metrics = evaluate(pos_test_pred, neg_test_pred, ks=[20, 50, 100])
                 for K in [20, 50, 100]:
-                    evaluator.K = K
-                    hits = evaluator.eval({
-                        'y_pred_pos': np.array(pos_test_pred),
-                        'y_pred_neg': np.array(neg_test_pred),
-                    })[f'hits@{K}']
-
-                    results[f'Hits@{K}'] = hits
+                    results[f'Hits@{K}'] = metrics[f'hits@{K}']
                 
                 with open(f'{out_path}/{name}_final.txt', 'a') as f:
                     f.write("On test set, model achieves:\n")
@@ -199,32 +187,21 @@ def load_test():
     pos_test_pred = model.score_edges(split_edge["test"]["edge"])
     neg_test_pred = model.score_edges(split_edge["test"]["edge_neg"])
 
-    evaluator = Evaluator(name='ogbl-ddi')
     results = {}
 
     # metrics on validation test
+    metrics = evaluate(pos_valid_preds, neg_valid_preds, ks=[20, 50, 100])
     for K in [20, 50, 100]:
-        evaluator.K = K
-        hits = evaluator.eval({
-            'y_pred_pos': np.array(pos_valid_preds),
-            'y_pred_neg': np.array(neg_valid_preds),
-        })[f'hits@{K}']
-
-        results[f'Hits@{K}'] = hits
+        results[f'Hits@{K}'] = metrics[f'hits@{K}']
     
     with open(f"results/graphsage.txt", 'w') as f:
         f.write("On validation set, model achieves:\n")
         f.write(str(results) + "\n\n")
 
     # metrics on test test
+    metrics = evaluate(pos_test_pred, neg_test_pred, ks=[20, 50, 100])
     for K in [20, 50, 100]:
-        evaluator.K = K
-        hits = evaluator.eval({
-            'y_pred_pos': np.array(pos_test_pred),
-            'y_pred_neg': np.array(neg_test_pred),
-        })[f'hits@{K}']
-
-        results[f'Hits@{K}'] = hits
+        results[f'Hits@{K}'] = metrics[f'hits@{K}']
     
     with open(f'results/graphsage.txt', 'a') as f:
         f.write("On test set, model achieves:\n")
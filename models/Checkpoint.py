@@ -0,0 +1,192 @@
+"""
+Compact checkpoints for the torch models.
+
+A checkpoint is a plain dict that torch.load can read with weights_only=True:
+
+    version     CHECKPOINT_VERSION
+    model       model type, e.g. "GraphSAGE"
+    config      hyperparameters needed to rebuild the modules (ints, floats and strings only)
+    state       module name -> state_dict
+    tensors     any other tensors the model needs for scoring (e.g. the graph)
+
+Only parameters are stored, never pickled nn.Module objects, so files stay small, load without
+running arbitrary pickle code and can be memory-mapped. CheckpointWriter writes them from a
+background thread during training and only keeps the best few.
+"""
+
+import json
+import os
+import pickle
+import queue
+import threading
+
+import torch
+
+CHECKPOINT_VERSION = 1
+INDEX = "checkpoints.json"
+
+
+def make_checkpoint(model_type:str, modules:dict, config=None, tensors=None) -> dict:
+    """modules: name -> nn.Module whose state_dict is stored"""
+    return {
+        "version": CHECKPOINT_VERSION,
+        "model": model_type,
+        "config": dict(config or {}),
+        "state": {name: module.state_dict() for name, module in modules.items()},
+        "tensors": dict(tensors or {}),
+    }
+
+
+def detach_checkpoint(obj):
+    """
+    Copy of a checkpoint with every tensor cloned to the CPU, so it can be written while training
+    keeps updating the parameters in place
+    """
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to("cpu", copy=True)
+    if isinstance(obj, dict):
+        return type(obj)((key, detach_checkpoint(value)) for key, value in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(detach_checkpoint(value) for value in obj)
+    return obj
+
+
+def save_checkpoint(path:str, checkpoint:dict) -> None:
+    """Writes the checkpoint to `path`, replacing it atomically"""
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    torch.save(checkpoint, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def is_checkpoint(checkpoint) -> bool:
+    return isinstance(checkpoint, dict) and "version" in checkpoint and "state" in checkpoint
+
+
+def load_checkpoint(path:str, model_type=None, map_location="cpu"):
+    """
+    Loads a checkpoint memory-mapped and with weights_only=True.
+
+    Files saved before checkpoints existed hold pickled nn.Modules, which weights_only refuses to
+    load. They are loaded with full unpickling instead and returned as they are (is_checkpoint()
+    is False for them), so only load legacy files you trust.
+    """
+    try:
+        checkpoint = torch.load(path, map_location=map_location, mmap=True, weights_only=True)
+    except pickle.UnpicklingError:
+        print(f"=> {path} is a legacy checkpoint, loading it with full unpickling")
+        return torch.load(path, map_location=map_location, weights_only=False)
+
+    if not is_checkpoint(checkpoint):
+        return checkpoint
+    if checkpoint["version"] != CHECKPOINT_VERSION:
+        raise Exception(f"{path} has checkpoint version {checkpoint['version']}, expected {CHECKPOINT_VERSION}")
+    if model_type is not None and checkpoint["model"] != model_type:
+        raise Exception(f"{path} holds a {checkpoint['model']} model, expected {model_type}")
+    return checkpoint
+
+
+def read_index(directory:str) -> list:
+    """Entries (name, score, ...) of the checkpoints kept in `directory`, best first"""
+    path = os.path.join(directory, INDEX)
+    if not os.path.isfile(path):
+        return []
+    with open(path, 'r') as f:
+        return json.load(f)["checkpoints"]
+
+
+def best_checkpoint(directory:str):
+    """Path of the best checkpoint written to `directory` by a CheckpointWriter, None if there is none"""
+    entries = read_index(directory)
+    if len(entries) == 0:
+        return None
+    return os.path.join(directory, entries[0]["name"])
+
+
+class CheckpointWriter:
+    """
+    Writes checkpoints to `directory` from a background thread and keeps the `keep` best.
+
+    submit() only copies the tensors to the CPU and queues them, so the training loop does not
+    wait on the disk (it only blocks if `max_pending` checkpoints are still waiting to be
+    written). Checkpoints that fall out of the best `keep` are deleted, and the kept ones are
+    listed best first in the directory's checkpoints.json (see best_checkpoint).
+
+    mode: "max" if higher scores are better (e.g. Hits@20), "min" if lower are (e.g. a loss)
+    """
+
+    def __init__(self, directory:str, keep=3, mode="max", max_pending=2) -> None:
+        if mode not in ("max", "min"):
+            raise Exception(f"{mode} is not a supported checkpoint mode.")
+
+        self.directory = directory
+        self.keep = keep
+        self.mode = mode
+        self.entries = []
+        self.error = None
+        os.makedirs(directory, exist_ok=True)
+
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, checkpoint:dict, name:str, score:float, **info) -> None:
+        """Queues `checkpoint` to be written as directory/name; `info` is recorded in the index"""
+        self.raise_error()
+        self.pending.put((detach_checkpoint(checkpoint), name, float(score), info))
+
+    def run(self):
+        while True:
+            item = self.pending.get()
+            try:
+                if item is None:
+                    return
+                self.write(*item)
+            except Exception as e:
+                self.error = e
+            finally:
+                self.pending.task_done()
+
+    def write(self, checkpoint, name, score, info):
+        save_checkpoint(os.path.join(self.directory, name), checkpoint)
+
+        entries = [entry for entry in self.entries if entry["name"] != name]
+        entries.append({"name": name, "score": score, **info})
+        entries.sort(key=lambda entry: entry["score"], reverse=self.mode == "max")
+        for entry in entries[self.keep:]:
+            path = os.path.join(self.directory, entry["name"])
+            if os.path.isfile(path):
+                os.remove(path)
+        self.entries = entries[:self.keep]
+
+        tmp_path = os.path.join(self.directory, f"{INDEX}.tmp{os.getpid()}")
+        with open(tmp_path, 'w') as f:
+            json.dump({"mode": self.mode, "checkpoints": self.entries}, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.directory, INDEX))
+
+    def best(self):
+        """Path of the best checkpoint written so far (call flush() first to include queued ones)"""
+        if len(self.entries) == 0:
+            return None
+        return os.path.join(self.directory, self.entries[0]["name"])
+
+    def flush(self) -> None:
+        """Waits until every submitted checkpoint is on disk"""
+        self.pending.join()
+        self.raise_error()
+
+    def close(self) -> None:
+        if self.thread.is_alive():
+            self.pending.put(None)
+            self.thread.join()
+        self.raise_error()
+
+    def raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
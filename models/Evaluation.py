@@ -0,0 +1,225 @@
+"""
+Hits@K / MRR evaluation for ogbl-ddi style link prediction, where every positive edge is ranked
+against one shared set of negative edges.
+
+ogb's Evaluator takes the top K of the negatives again for every K it is asked about. Here the
+negatives are sorted once and every positive is located in them with a binary search, which
+gives the number of negatives scoring above each positive, and from that Hits@K for any set of
+Ks, the MRR and the per-positive ranks in one pass. When only Hits@K is needed (ranks=False),
+just the top max(ks) negatives are partitioned out and sorted.
+
+The definitions match ogb: a positive is a hit at K if it scores strictly higher than the K-th
+best negative (i.e. fewer than K negatives score >= it), and its rank is the mean of the
+optimistic and pessimistic ranks, so ties count half.
+"""
+
+import numpy as np
+import torch
+
+KS = (20, 50, 100)
+# negative arrays up to this size stay in cache, so positives are searched in them unsorted
+SMALL = 4096
+
+
+def as_scores(scores) -> np.ndarray:
+    """1-D numpy array of a chunk of scores (numpy array, tensor or list)"""
+    if isinstance(scores, torch.Tensor):
+        scores = scores.detach().cpu().numpy()
+    return np.asarray(scores).ravel()
+
+
+def score_chunks(scores):
+    """
+    Iterates over the chunks of `scores`, which is either a single array/tensor/list of scores or
+    an iterator over chunks of them (e.g. a model's iter_scores)
+    """
+    if isinstance(scores, (np.ndarray, torch.Tensor, list, tuple)):
+        yield as_scores(scores)
+    else:
+        for chunk in scores:
+            yield as_scores(chunk)
+
+
+class SortedNegatives:
+    """
+    The negative scores, sorted once, against which positives are ranked. With `top`, only the
+    `top` highest negatives are kept, so counts are exact up to `top` and capped there.
+    """
+
+    def __init__(self, y_pred_neg, top=None) -> None:
+        scores = np.concatenate(list(score_chunks(y_pred_neg)))
+        if top is not None and top < len(scores):
+            scores = np.partition(scores, len(scores) - top)[len(scores) - top:]
+        self.scores = np.sort(scores)
+
+    def __len__(self):
+        return len(self.scores)
+
+    def counts(self, y_pred_pos, sides=("left", "right")) -> list:
+        """
+        Number of negatives scoring >= (side "left") and/or > (side "right") each positive, one
+        array per entry of sides
+        """
+        y_pred_pos = as_scores(y_pred_pos)
+        if len(self.scores) <= SMALL:
+            return [len(self.scores) - np.searchsorted(self.scores, y_pred_pos, side=side) for side in sides]
+
+        # binary searches over sorted queries walk the negatives in order, which is several
+        # times faster than searching in random order
+        order = np.argsort(y_pred_pos)
+        queries = y_pred_pos[order]
+        counts = []
+        for side in sides:
+            count = np.empty(len(queries), dtype=np.int64)
+            count[order] = len(self.scores) - np.searchsorted(self.scores, queries, side=side)
+            counts.append(count)
+        return counts
+
+
+def evaluate(y_pred_pos, y_pred_neg, ks=KS, ranks=True) -> dict:
+    """
+    Ranks the positives against the shared negatives. Both inputs are arrays, tensors, lists or
+    iterators over chunks of scores; positives are ranked chunk by chunk as they arrive.
+
+    Returns {"hits@K": float for every K in ks, "mrr": float, "ranks": (P,) array of the
+    positives' 1-based ranks}. With ranks=False only the Hits@K entries are computed.
+    """
+    negatives = SortedNegatives(y_pred_neg, top=None if ranks else max(ks))
+    sides = ("left", "right") if ranks else ("left",)
+    counts = [negatives.counts(chunk, sides) for chunk in score_chunks(y_pred_pos)]
+    greater_equal = np.concatenate([count[0] for count in counts])
+
+    results = {f"hits@{K}": float(np.mean(greater_equal < K)) for K in ks}
+    if ranks:
+        greater = np.concatenate([count[1] for count in counts])
+        results["ranks"] = 0.5 * (greater + greater_equal) + 1
+        results["mrr"] = float(np.mean(1 / results["ranks"]))
+    return results
+
+
+def degree_strata(edges, degree:np.ndarray, num_strata=4) -> np.ndarray:
+    """
+    Stratum of every (E, 2) edge: the quantile bin of the smaller degree of its endpoints, which
+    is what most separates easy from hard pairs on ddi
+    """
+    edges = as_scores(edges).reshape(-1, 2)
+    min_degree = np.minimum(degree[edges[:, 0]], degree[edges[:, 1]])
+    bounds = np.quantile(min_degree, np.linspace(0, 1, num_strata + 1)[1:-1])
+    return np.searchsorted(bounds, min_degree, side="right")
+
+
+def stratified_sample(strata:np.ndarray, fraction:float, rng:np.random.Generator) -> np.ndarray:
+    """Sorted indices of `fraction` of the items of every stratum (at least one each)"""
+    index = []
+    for stratum in np.unique(strata):
+        members = np.flatnonzero(strata == stratum)
+        size = max(1, int(round(fraction * len(members))))
+        index.append(rng.choice(members, size, replace=False))
+    return np.sort(np.concatenate(index))
+
+
+class SampledValidation:
+    """
+    Cheap per-epoch model selection on Hits@K. A fixed stratified subsample of the positive and
+    negative validation edges is scored every epoch, and Hits@K is estimated on it with a
+    bootstrap confidence interval. The full validation set is only scored when the interval's
+    upper bound reaches the best Hits@K so far, i.e. when the epoch could be a new best.
+
+    On the subsample, K is scaled to the fraction of negatives kept (the K-th best of all
+    negatives is about the K * fraction-th best of the sample). The bootstrap uses Poisson(1)
+    weights, so it is a few vectorized ops rather than num_bootstrap re-evaluations, and its error
+    is shrunk by the fraction of each edge set sampled, since the target is the full validation
+    set rather than the population it was drawn from.
+
+    All negatives are kept by default (neg_fraction=1.0): Hits@K hinges on the K-th best negative,
+    which a subsample pins down so loosely that the upper bound reaches the best on most epochs
+    and they escalate anyway.
+
+    pos_strata, neg_strata: stratum of every positive/negative validation edge (e.g.
+        degree_strata)
+    fraction, neg_fraction: fraction of the positives/negatives in the subsample
+    """
+
+    def __init__(self, pos_strata, neg_strata, fraction=0.2, neg_fraction=1.0, K=20, num_bootstrap=200, alpha=0.05,
+                 seed=0) -> None:
+        rng = np.random.default_rng(seed)
+        self.pos_index = stratified_sample(np.asarray(pos_strata), fraction, rng)
+        self.neg_index = stratified_sample(np.asarray(neg_strata), neg_fraction, rng)
+        self.num_pos = len(pos_strata)
+        self.num_neg = len(neg_strata)
+        # the subsample of each edge set and the rest of it, scored only on escalation
+        self.index = {"edge": self.pos_index, "edge_neg": self.neg_index}
+        self.rest = {key: np.setdiff1d(np.arange(len(strata)), self.index[key])
+                     for key, strata in [("edge", pos_strata), ("edge_neg", neg_strata)]}
+        self.K = K
+        self.sample_K = max(1, int(round(K * len(self.neg_index) / self.num_neg)))
+        self.num_bootstrap = num_bootstrap
+        self.alpha = alpha
+        self.rng = rng
+
+    @classmethod
+    def uniform(cls, num_pos:int, num_neg:int, **kwargs):
+        return cls(np.zeros(num_pos, dtype=np.int64), np.zeros(num_neg, dtype=np.int64), **kwargs)
+
+    def estimate(self, pos_scores, neg_scores):
+        """(Hits@K estimate, lower, upper) from the scores of the sampled positives and negatives"""
+        pos_scores = as_scores(pos_scores)
+        neg_scores = as_scores(neg_scores)
+        hits = evaluate(pos_scores, neg_scores, ks=[self.sample_K], ranks=False)[f"hits@{self.sample_K}"]
+
+        # the resampled threshold is the sample_K-th best negative under Poisson(1) weights; only
+        # the top negatives can be it
+        top = min(len(neg_scores), 10 * self.sample_K + 50)
+        top_neg = -np.sort(-neg_scores)[:top]
+        neg_weights = self.rng.poisson(1.0, size=(self.num_bootstrap, top)).cumsum(axis=1)
+        thresholds = top_neg[np.minimum((neg_weights < self.sample_K).sum(axis=1), top - 1)]
+        sorted_pos = np.sort(pos_scores)
+        neg_error = (len(sorted_pos) - np.searchsorted(sorted_pos, thresholds, side="right")) / len(sorted_pos) - hits
+
+        # under Poisson(1) weights, the total weight of the positives above the threshold and of
+        # the ones below it are independent Poisson draws
+        above = int(round(hits * len(sorted_pos)))
+        hit_weight = self.rng.poisson(above, self.num_bootstrap)
+        pos_error = hit_weight / np.maximum(hit_weight + self.rng.poisson(len(sorted_pos) - above, self.num_bootstrap), 1) - hits
+
+        # the target is Hits@K on the full validation set, not on the population it was drawn
+        # from, so each part's error shrinks with the fraction of it that was sampled
+        # (finite population correction); scoring all negatives leaves only the positives' error
+        samples = np.clip(hits + np.sqrt(1 - len(self.neg_index) / self.num_neg) * neg_error
+                          + np.sqrt(1 - len(self.pos_index) / self.num_pos) * pos_error, 0.0, 1.0)
+
+        lower, upper = np.quantile(samples, [self.alpha / 2, 1 - self.alpha / 2])
+        if above == 0:
+            # with no sampled hits every Poisson draw of the hit weight is 0 and the interval
+            # collapses to (0, 0); floor the upper bound at the exact binomial bound for zero
+            # successes, ln(2 / alpha) / n (the rule of three, 3 / n, at alpha=0.05)
+            upper = max(upper, np.log(2 / self.alpha) / len(sorted_pos))
+        return hits, float(lower), float(upper)
+
+    def complete(self, score, key, scores) -> np.ndarray:
+        """Scores of all of val_edges[key], given the scores of its subsample"""
+        index, rest = self.index[key], self.rest[key]
+        out = np.empty(len(index) + len(rest), dtype=np.float32)
+        out[index] = as_scores(scores)
+        if len(rest):
+            out[rest] = as_scores(score(key, rest))
+        return out
+
+    def validate(self, score, best:float) -> dict:
+        """
+        Validates one epoch. score(key, index) returns the scores of the validation edges
+        val_edges[key][index] (key "edge" or "edge_neg", index an array of edge indices).
+        Returns {"Hits@K_sampled": the estimate on the subsample, "sampled": (estimate, lower,
+        upper), "full": whether the full set was scored, "Hits@K": full-set Hits@K, only if it
+        was}. The estimate is biased when the negatives are subsampled, so only "Hits@K" is
+        comparable across epochs and with full validation.
+        """
+        pos_scores, neg_scores = score("edge", self.pos_index), score("edge_neg", self.neg_index)
+        sampled = self.estimate(pos_scores, neg_scores)
+        result = {f"Hits@{self.K}_sampled": sampled[0], "sampled": sampled, "full": max(sampled[0], sampled[2]) >= best}
+        if result["full"]:
+            # only the edges outside the subsample still need scoring
+            metrics = evaluate(self.complete(score, "edge", pos_scores), self.complete(score, "edge_neg", neg_scores),
+                               ks=[self.K], ranks=False)
+            result[f"Hits@{self.K}"] = metrics[f"hits@{self.K}"]
+        return result
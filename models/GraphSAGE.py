@@ -13,16 +13,42 @@ class GraphSAGE(LinkPredictor):
         self.model = None
         self.link_predictor = None
         self.edge_idx = None
-        self.batch_size = -1
+        self.adj_t = None   # CSR adjacency used for message passing
+        self.graph = None   # CSRGraph of the training graph
+        self.graph_key = None   # hash of the training graph in the graph store
+        self.batch_size = -1   # training batch size, kept as a record; scoring sizes its batches from models.Inference.MEMORY_BUDGET
+        self.config = None   # hyperparameters needed to rebuild the modules from a checkpoint
+
+        # Node embeddings computed by the GNN, reused until a parameter or the graph changes
+        self.graph_version = 0
+        self.node_emb = None
+        self.node_emb_version = None
 
     
     def train(self, graph, val_edges, epochs=200, hidden_dim=256, num_layers=2, dropout=0.3, lr = 3e-3,
-              node_emb_dim = 256, batch_size = 64 * 512, out_path="models/trained_model_files"):
+              node_emb_dim = 256, batch_size = 64 * 512, out_path="models/trained_model_files",
+              sampling="full", fanouts=None, seed=0, val_start_epoch=101, negative_sampler=None,
+              keep_checkpoints=3, validation="full", val_fraction=0.2, val_neg_fraction=1.0):
         """
         Trains the GNN model
         graph: networkx graph of training data
         val_edges: dictionary with positive edges on `edge` and negative edges at `neg_edge`
+        sampling: "full" runs message passing over the whole graph for every batch, "neighbor"
+            only over a sampled subgraph around the batch's endpoints (see sample_subgraph)
+        fanouts: number of neighbors sampled per node at each hop in "neighbor" mode (one
+            entry per layer, 15 each by default)
+        val_start_epoch: first epoch (0-based) at which Hits@20 on val_edges is computed and the
+            best model is saved
+        negative_sampler: NegativeSampler of the training graph, a uniform one by default
+        keep_checkpoints: number of best checkpoints kept in out_path/gnn_trained
+        validation: "full" scores all of val_edges every epoch, "sampled" a degree-stratified
+            val_fraction of the positives and val_neg_fraction of the negatives, escalating to the
+            full set only when the epoch may be a new best (see models.Evaluation.SampledValidation)
         """
+        if sampling not in ("full", "neighbor"):
+            raise Exception(f"{sampling} is not a supported sampling mode.")
+        if validation not in ("full", "sampled"):
+            raise Exception(f"{validation} is not a supported validation mode.")
         
         num_nodes = graph.number_of_nodes()
         device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
@@ -33,25 +59,16 @@ class GraphSAGE(LinkPredictor):
 
         # Convert input graph into something that can be used by PyTorch
         #   - pos_train_edge (PE x 2) tensor of edges
-        #   - edge_idx (2 x E) tensor of edges
-
-        pos_list = []
-        edge_list = [[], []]
-        seen_nodes = set()
-
-        for node, nbr_dict in graph.adjacency():
-            seen_nodes.add(node)
-            for n in nbr_dict.keys():
-                if n not in seen_nodes:
-                    pos_list.append([node, n])
-                edge_list[0].append(int(node))
-                edge_list[0].append(int(n))
-                edge_list[1].append(int(n))
-                edge_list[1].append(int(node))
-
-        pos_train_edge = torch.tensor(pos_list).to(device)
-        edge_index = torch.tensor(edge_list).to(device)
+        #   - edge_idx (2 x E) tensor of edges, used for negative sampling
+        #   - adj_t (N x N) CSR adjacency, used for message passing
+        self.graph = to_csr_graph(graph)
+        self.graph_key = store_graph(self.graph)
+        pos_train_edge, edge_index = graph_tensors(self.graph, device)
         self.edge_idx = edge_index
+        self.adj_t = sparse_adj(self.graph, device)
+        if negative_sampler is None:
+            negative_sampler = NegativeSampler(self.graph, seed=seed, device=device)
+        self.graph_version += 1
 
         if val_edges is not None:
             # TODO: Need to convert these to a tensor?
@@ -60,14 +77,14 @@ class GraphSAGE(LinkPredictor):
             # val_edges = torch.Tensor(val_edges).to(device)
 
 
-        evaluator = Evaluator(name='ogbl-ddi')
-
         # Node embeddings that must be learned
         self.emb = torch.nn.Embedding(num_nodes, node_emb_dim).to(device)
         # GNN uses message passing to aggregate node embeddings
         self.model = GNNStack(node_emb_dim, hidden_dim, hidden_dim, num_layers, dropout, emb=True).to(device)
         # MLP that takes embeddings of a pair of nodes and predicts whether there is an edge
         self.link_predictor = LinkPredictor(hidden_dim, hidden_dim, 1, num_layers + 1, dropout).to(device)
+        self.config = {"num_nodes": num_nodes, "node_emb_dim": node_emb_dim, "hidden_dim": hidden_dim,
+                       "num_layers": num_layers, "dropout": dropout}
 
         # Jointly optimize all 3 components
         optimizer = torch.optim.Adam(
@@ -91,68 +108,175 @@ class GraphSAGE(LinkPredictor):
         #         min_val = val_loss
         #         print("=> min val loss =", min_val)
 
+        if sampling == "neighbor":
+            csr = self.graph
+            fanouts = fanouts if fanouts is not None else [15] * num_layers
+            rng = np.random.default_rng(seed)
+
+        # per-epoch loss, wall time (training and validation) and validation Hits@20
+        self.history = []
+
+        if validation == "sampled":
+            degree = self.graph.degree()
+            validator = SampledValidation(degree_strata(val_edges["edge"], degree), degree_strata(val_edges["edge_neg"], degree),
+                                          fraction=val_fraction, neg_fraction=val_neg_fraction, seed=seed)
+
+        # Checkpoints are written in the background and only reference the stored graph
+        writer = CheckpointWriter(f"{out_path}/gnn_trained", keep=keep_checkpoints)
+
         max_val = -1
         for e in range(epochs):
-            loss = train(self.model, self.link_predictor, self.emb.weight, edge_index, pos_train_edge, batch_size, optimizer)
-            print(f"Epoch {e + 1}: loss: {round(loss, 5)}")
+            start = time.time()
+            if sampling == "neighbor":
+                loss = train_sampled(self.model, self.link_predictor, self.emb.weight, csr, negative_sampler, pos_train_edge,
+                                     batch_size, optimizer, fanouts, rng)
+            else:
+                loss = train(self.model, self.link_predictor, self.emb.weight, edge_index, pos_train_edge, batch_size, optimizer,
+                             adj_t=self.adj_t, negative_sampler=negative_sampler)
+            epoch_time = time.time() - start
+            print(f"Epoch {e + 1}: loss: {round(loss, 5)} ({sampling}, {round(epoch_time, 2)}s)")
 
             result = {}
-
-            # Don't start saving until epoch 90
-            if e > 100:
-                pos_valid_preds = self.score_edges(val_edges["edge"])
-                neg_valid_preds = self.score_edges(val_edges["edge_neg"])
-
-                # metrics on validation test
-                for K in [20]:
-                    evaluator.K = K
-                    hits = evaluator.eval({
-                        'y_pred_pos': np.array(pos_valid_preds),
-                        'y_pred_neg': np.array(neg_valid_preds),
-                    })[f'hits@{K}']
-
-                    result[f'Hits@{K}'] = hits
-
-                val_performance = result['Hits@20']
-                if (e+1)%10 == 0:
-                    print(result)
-                if val_performance > max_val:
-                    os.makedirs(f"{out_path}/gnn_trained/", exist_ok=True)
-                    self.save_model(model_path=f"{out_path}/gnn_trained/ep{e}_gnn.pt")
+            self.history.append({"epoch": e + 1, "loss": loss, "time": epoch_time, "result": result})
+
+            # Don't start saving until val_start_epoch
+            if e >= val_start_epoch:
+                start = time.time()
+                if validation == "sampled":
+                    score = lambda key, index: self.score_edges(val_edges[key][index])
+                    result.update(validator.validate(score, max_val))
+                else:
+                    pos_valid_preds = self.score_edges(val_edges["edge"])
+                    neg_valid_preds = self.score_edges(val_edges["edge_neg"])
+
+                    # metrics on validation test
+                    metrics = evaluate(pos_valid_preds, neg_valid_preds, ks=[20], ranks=False)
+                    for K in [20]:
+                        result[f'Hits@{K}'] = metrics[f'hits@{K}']
+                self.history[-1]["val_time"] = time.time() - start
+
+                # sampled epochs that could not be a new best have no full-set Hits@20
+                val_performance = result.get('Hits@20')
+                print(f"\t{result}")
+                if val_performance is not None and val_performance > max_val:
+                    writer.submit(self.checkpoint(), f"ep{e}_gnn.pt", val_performance, epoch=e)
                     max_val = val_performance
                     print("=> max val =", max_val)
 
+        writer.close()
+
 
 
     def score_edge(self, node1, node2):
         self.model.eval()
         self.link_predictor.eval()
         edge_list = [[node1, node2]]
-        pred_list = self.score_edges(edge_list, batch_size=1)
+        pred_list = self.score_edges(edge_list)
         return pred_list[0]
     
 
-    def score_edges(self, edge_list, batch_size=-1):
-        if batch_size == -1:
-            batch_size = self.batch_size
-        self.model.eval()
-        self.link_predictor.eval()
-
-        node_emb = self.model(self.emb.weight, self.edge_idx)
-
-        edges = torch.tensor(edge_list) # NOTE: edges need to be lists of integers
-        edges.to(self.emb.weight.device)    # Put edges on the same device
+    def score_edges(self, edge_list, batch_size=None):
+        """
+        Scores the edges with the link predictor on top of the cached node embeddings, so only
+        the first call after a parameter update runs the GNN. Returns a float32 array; the
+        batch size is chosen from the memory budget of models.Inference by default.
+        """
+        return Inference.score_edges(self.link_predictor, self.node_embeddings(), edge_list, batch_size)
 
-        preds = []
-        for perm in DataLoader(range(edges.size(0)), batch_size):
-            edge = edges[perm].t()
-            preds += [self.link_predictor(node_emb[edge[0]], node_emb[edge[1]]).squeeze().cpu()]
-        pred = torch.cat(preds, dim=0)
-        pred_list = pred.detach().cpu().numpy() 
+    def iter_scores(self, edge_list, batch_size=None):
+        """Streams the scores of edge_list as float32 chunks, see score_edges"""
+        return Inference.iter_scores(self.link_predictor, self.node_embeddings(), edge_list, batch_size)
 
-        return pred_list
+    def embedding_version(self):
+        """
+        Identifies the current parameters and graph. Every in-place update of a tensor (e.g. an
+        optimizer step) bumps its `_version`, so any change to the embeddings or the GNN weights
+        gives a new key.
+        """
+        params = list(self.emb.parameters()) + list(self.model.parameters())
+        return (self.graph_version,) + tuple((id(p), p._version) for p in params)
+
+    def node_embeddings(self):
+        """(N, d) output of the GNN in eval mode, recomputed only when embedding_version() changes"""
+        if self.model is None:   # only exported embeddings were loaded
+            return self.node_emb
+
+        version = self.embedding_version()
+        if self.node_emb is None or self.node_emb_version != version:
+            self.model.eval()
+            with torch.no_grad():
+                self.node_emb = self.model(self.emb.weight, self.message_passing_adj())
+            self.node_emb_version = version
+        return self.node_emb
+
+    def training_graph(self):
+        """CSRGraph of the training graph, rebuilt from edge_idx for models saved with it"""
+        if self.graph is None:
+            edges = self.edge_idx.t().cpu().numpy()
+            self.graph = build_csr(edges, self.emb.num_embeddings)
+        return self.graph
+
+    def message_passing_adj(self):
+        """The CSR adjacency, built on first use after loading"""
+        if self.adj_t is None:
+            self.adj_t = sparse_adj(self.training_graph(), self.emb.weight.device)
+        return self.adj_t
+
+    def precompute_embeddings(self):
+        """Runs the GNN once so that later score_edges calls only run the link predictor"""
+        return self.node_embeddings()
+
+    def export_embeddings(self, path):
+        """Saves the (N, d) float32 node embeddings to a .npy file, see load_embeddings"""
+        np.save(path, self.node_embeddings().cpu().numpy().astype(np.float32))
+
+    def load_embeddings(self, path):
+        """
+        Scores with exported embeddings instead of running the GNN. Only the link predictor is
+        needed (e.g. from load_model); the embeddings are used until the model is retrained.
+        """
+        device = self.emb.weight.device if self.emb is not None else None
+        self.node_emb = torch.from_numpy(np.load(path)).to(device)
+        self.node_emb_version = self.embedding_version() if self.model is not None else None
     
 
+    def checkpoint(self):
+        """
+        Checkpoint of the model: the state_dicts, the hyperparameters and the hash of the
+        training graph, which is kept once in the graph store instead of in every checkpoint
+        """
+        if self.graph_key is None:
+            self.graph_key = store_graph(self.training_graph())
+        # batch_size is the training batch size, saved for reference only: inference ignores it
+        config = dict(self.config, batch_size=self.batch_size, graph=self.graph_key)
+        modules = {"emb": self.emb, "model": self.model, "link_predictor": self.link_predictor}
+        return make_checkpoint("GraphSAGE", modules, config)
+
+    def restore(self, checkpoint):
+        """
+        Rebuilds the modules from a checkpoint. The graph is memory-mapped from the graph store
+        and the message passing adjacency is only built when needed.
+        """
+        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        config = checkpoint["config"]
+        self.config = {key: config[key] for key in ("num_nodes", "node_emb_dim", "hidden_dim", "num_layers", "dropout")}
+        self.batch_size = config["batch_size"]
+
+        hidden_dim, num_layers, dropout = config["hidden_dim"], config["num_layers"], config["dropout"]
+        self.emb = torch.nn.Embedding(config["num_nodes"], config["node_emb_dim"])
+        self.model = GNNStack(config["node_emb_dim"], hidden_dim, hidden_dim, num_layers, dropout, emb=True)
+        self.link_predictor = LinkPredictor(hidden_dim, hidden_dim, 1, num_layers + 1, dropout)
+        for name in ("emb", "model", "link_predictor"):
+            module = getattr(self, name)
+            module.load_state_dict(checkpoint["state"][name])
+            setattr(self, name, module.to(device))
+
+        self.graph_key = config["graph"]
+        self.graph = resolve_graph(self.graph_key)
+        self.edge_idx = None
+        self.adj_t = None
+        self.graph_version += 1
+
     # NOTE: These assume you're running the command from LinkPredicitonOGB directory
     def save_model(self, model_path=None):
         if model_path is None:
@@ -160,13 +284,7 @@ class GraphSAGE(LinkPredictor):
         elif model_path[-3:] != ".pt":      # NOTE: given path is directory
             model_path += "/gnn.pt"
         
-        torch.save({
-            "emb": self.emb,
-            "model": self.model,
-            "link_predictor": self.link_predictor,
-            "edge_idx": self.edge_idx,
-            "batch_size": self.batch_size
-        }, model_path)
+        save_checkpoint(model_path, self.checkpoint())
     
     def load_model(self, model_path=None):
         if model_path is None:
@@ -174,12 +292,23 @@ class GraphSAGE(LinkPredictor):
         elif model_path[-3:] != ".pt":      # NOTE: given path is directory
             model_path += "/gnn.pt"
         
-        model_dict = torch.load(model_path)
-        self.emb = model_dict["emb"]
-        self.model = model_dict["model"]
-        self.link_predictor = model_dict["link_predictor"]
-        self.edge_idx = model_dict["edge_idx"]
-        self.batch_size = model_dict["batch_size"]
+        model_dict = load_checkpoint(model_path, "GraphSAGE")
+        if is_checkpoint(model_dict):
+            self.restore(model_dict)
+        else:   # legacy file of pickled modules
+            self.emb = model_dict["emb"]
+            self.model = model_dict["model"]
+            self.link_predictor = model_dict["link_predictor"]
+            self.edge_idx = model_dict["edge_idx"]
+            self.adj_t = model_dict.get("adj_t")
+            self.graph = None
+            self.graph_key = None
+            self.batch_size = model_dict["batch_size"]
+            self.config = {"num_nodes": self.emb.num_embeddings, "node_emb_dim": self.emb.embedding_dim,
+                           "hidden_dim": self.model.convs[0].out_channels, "num_layers": self.model.num_layers,
+                           "dropout": self.model.dropout}
+            self.graph_version += 1
+        self.node_emb = None
 
 
 
@@ -193,7 +322,15 @@ import torch.nn.functional as F
 import torch_geometric as pyg
 from torch_geometric.data import DataLoader
 from torch_geometric.utils import negative_sampling
-from ogb.linkproppred import PygLinkPropPredDataset, Evaluator
+from ogb.linkproppred import PygLinkPropPredDataset
+from models.Evaluation import SampledValidation, degree_strata, evaluate
+from dataset.graph_convert import graph_tensors, sparse_adj, to_csr_graph
+from dataset.graph_store import build_csr, resolve_graph, store_graph
+import models.Inference as Inference
+from models.Checkpoint import CheckpointWriter, is_checkpoint, load_checkpoint, make_checkpoint, save_checkpoint
+from models.NegativeSampler import NegativeSampler
+from dataset.edge_keys import unique_keys
+import time
 
 # Implementation largely taken from this repository:
 # https://github.com/samar-khanna/cs224w-project
@@ -224,7 +361,8 @@ class GNNStack(torch.nn.Module):
         """
         Applies this module's graph convolutions to the given data
             x: Node embeddings
-            edge_index: Edges to use in convolutional layers
+            edge_index: Edges to use in convolutional layers, either a (2, E) edge index or a
+                sparse (N, N) adj_t (see dataset.graph_convert.sparse_adj)
         """
         for i in range(self.num_layers):
             x = self.convs[i](x, edge_index)
@@ -277,7 +415,7 @@ class LinkPredictor(nn.Module):
 
 
 
-def train(model, link_predictor, emb, edge_index, pos_train_edge, batch_size, optimizer):
+def train(model, link_predictor, emb, edge_index, pos_train_edge, batch_size, optimizer, adj_t=None, negative_sampler=None):
     """
     Runs offline training for model, link_predictor and node embeddings given the message
     edges and supervision edges.
@@ -288,6 +426,9 @@ def train(model, link_predictor, emb, edge_index, pos_train_edge, batch_size, op
     :param pos_train_edge: (PE, 2) Positive edges used for training supervision loss
     :param batch_size: Number of positive (and negative) supervision edges to sample per batch
     :param optimizer: Torch Optimizer to update model parameters
+    :param adj_t: Optional (N, N) sparse adjacency (see dataset.graph_convert.sparse_adj) used for
+        message passing instead of edge_index
+    :param negative_sampler: NegativeSampler of the graph, or None to use PyG's negative_sampling
     :return: Average supervision loss over all positive (and correspondingly sampled negative) edges
     """
     model.train()
@@ -295,19 +436,19 @@ def train(model, link_predictor, emb, edge_index, pos_train_edge, batch_size, op
 
     train_losses = []
 
-    for edge_id in DataLoader(range(pos_train_edge.shape[0]), batch_size, shuffle=True):
+    batches = list(DataLoader(range(pos_train_edge.shape[0]), batch_size, shuffle=True))
+    negatives = negative_batches(negative_sampler, batches, pos_train_edge, edge_index, emb.shape[0])
+    for edge_id, neg_edge in zip(batches, negatives):
         optimizer.zero_grad()
 
         # Run message passing on the inital node embeddings to get updated embeddings
-        node_emb = model(emb, edge_index)  # (N, d)
+        node_emb = model(emb, adj_t if adj_t is not None else edge_index)  # (N, d)
 
         # Predict the class probabilities on the batch of positive edges using link_predictor
         pos_edge = pos_train_edge[edge_id].T  # (2, B)
         pos_pred = link_predictor(node_emb[pos_edge[0]], node_emb[pos_edge[1]])  # (B, )
 
-        # Sample negative edges (same number as number of positive edges) and predict class probabilities 
-        neg_edge = negative_sampling(edge_index, num_nodes=emb.shape[0],
-                                     num_neg_samples=edge_id.shape[0], method='dense')  # (Ne,2)
+        # Predict class probabilities on the negative edges (same number as positive edges)
         neg_pred = link_predictor(node_emb[neg_edge[0]], node_emb[neg_edge[1]])  # (Ne,)
 
         # Compute the corresponding negative log likelihood loss on the positive and negative edges
@@ -320,6 +461,95 @@ def train(model, link_predictor, emb, edge_index, pos_train_edge, batch_size, op
         train_losses.append(loss.item())
     return sum(train_losses) / len(train_losses)
 
+def sample_subgraph(csr, seeds, fanouts, rng):
+    """
+    Samples the message passing subgraph needed to embed `seeds`. Starting from the seeds, every
+    node of the current frontier receives messages from up to fanouts[i] of its neighbors at hop
+    i (drawn with replacement, duplicates merged), and the newly reached nodes form the next
+    frontier.
+    :param csr: CSRGraph of the training graph
+    :param seeds: Global ids of the nodes whose embeddings are needed
+    :param fanouts: Number of sampled neighbors per node, one entry per hop (GNN layer)
+    :return: (nodes, edge_index) with the sorted global ids of all sampled nodes and the (2, E)
+        edges (source -> target) between them in local ids, i.e. positions in `nodes`
+    """
+    num_nodes = csr.num_nodes
+    indptr = np.asarray(csr.indptr, dtype=np.int64)
+    frontier = unique_keys(np.asarray(seeds, dtype=np.int64))
+    visited = frontier
+    keys = []
+
+    for fanout in fanouts:
+        degree = indptr[frontier + 1] - indptr[frontier]
+        frontier = frontier[degree > 0]
+        degree = degree[degree > 0]
+        if len(frontier) == 0:
+            break
+
+        targets = np.repeat(frontier, fanout)
+        offsets = (rng.random(len(targets)) * np.repeat(degree, fanout)).astype(np.int64)
+        sources = np.asarray(csr.indices)[np.repeat(indptr[frontier], fanout) + offsets].astype(np.int64)
+        keys.append(sources * num_nodes + targets)
+
+        reached = unique_keys(sources)
+        frontier = reached[~np.isin(reached, visited, assume_unique=True)]
+        visited = unique_keys(np.concatenate([visited, frontier]))
+
+    keys = unique_keys(np.concatenate(keys)) if keys else np.empty(0, dtype=np.int64)
+    nodes = visited
+    edge_index = np.stack([np.searchsorted(nodes, keys // num_nodes), np.searchsorted(nodes, keys % num_nodes)])
+    return nodes, edge_index
+
+
+def train_sampled(model, link_predictor, emb, csr, negative_sampler, pos_train_edge, batch_size, optimizer, fanouts, rng):
+    """
+    Same as train(), but each batch runs message passing only over the subgraph sampled around
+    the endpoints of its positive and negative supervision edges (see sample_subgraph), so the
+    cost of a step depends on the batch size and fanouts instead of the size of the graph.
+    :param csr: CSRGraph of the training graph, used for neighbor sampling
+    :param negative_sampler: NegativeSampler of the training graph
+    :param fanouts: Number of sampled neighbors per node for each GNN layer
+    :param rng: numpy Generator used for neighbor sampling
+    :return: Average supervision loss over all positive (and correspondingly sampled negative) edges
+    """
+    model.train()
+    link_predictor.train()
+
+    train_losses = []
+
+    batches = list(DataLoader(range(pos_train_edge.shape[0]), batch_size, shuffle=True))
+    for edge_id, neg_edge in zip(batches, negative_sampler.epoch(batches, pos_train_edge)):
+        optimizer.zero_grad()
+
+        pos_edge = pos_train_edge[edge_id].T  # (2, B)
+
+        # Run message passing on the sampled subgraph around the batch's endpoints only
+        seeds = torch.cat([pos_edge.reshape(-1), neg_edge.reshape(-1)]).cpu().numpy()
+        nodes, sub_edge_index = sample_subgraph(csr, seeds, fanouts, rng)
+        nodes = torch.from_numpy(nodes).to(emb.device)
+        node_emb = model(emb[nodes], torch.from_numpy(sub_edge_index).to(emb.device))  # (n, d)
+
+        # Supervision edges in local ids of the subgraph
+        pos_edge = torch.searchsorted(nodes, pos_edge.contiguous())
+        neg_edge = torch.searchsorted(nodes, neg_edge.contiguous())
+        pos_pred = link_predictor(node_emb[pos_edge[0]], node_emb[pos_edge[1]])  # (B, )
+        neg_pred = link_predictor(node_emb[neg_edge[0]], node_emb[neg_edge[1]])  # (Ne,)
+
+        loss = -torch.log(pos_pred + 1e-15).mean() - torch.log(1 - neg_pred + 1e-15).mean()
+
+        loss.backward()
+        optimizer.step()
+
+        train_losses.append(loss.item())
+    return sum(train_losses) / len(train_losses)
+
+def negative_batches(negative_sampler, batches, pos_train_edge, edge_index, num_nodes):
+    """Negative edges for each batch, from the NegativeSampler or else PyG's dense negative_sampling"""
+    if negative_sampler is not None:
+        return negative_sampler.epoch(batches, pos_train_edge)
+    return (negative_sampling(edge_index, num_nodes=num_nodes, num_neg_samples=len(batch), method='dense')
+            for batch in batches)
+
 def test(model, predictor, emb, edge_index, pos_edge, neg_edge, batch_size, evaluator):
     # NOTE: This just returns the val loss now
     """
@@ -0,0 +1,68 @@
+"""
+Shared scoring loop for the torch link predictors.
+
+GraphSAGE, MatrixFactorization and RandomWalkMLP all score an edge (u, v) as
+predictor(node_emb[u], node_emb[v]) on a fixed (N, d) table of node embeddings (the GNN output,
+the learned embeddings and the Node2Vec embeddings respectively). This module runs that loop in
+inference mode, in batches sized from a memory budget, either into a preallocated float32 array
+(score_edges) or as a stream of chunks (iter_scores).
+"""
+
+import numpy as np
+import torch
+
+# Bytes of activations a single scoring batch may use
+MEMORY_BUDGET = 256 * 1024 * 1024
+MAX_BATCH_SIZE = 1 << 20
+
+
+def batch_size_for(predictor, emb_dim:int, memory_budget=MEMORY_BUDGET) -> int:
+    """
+    Largest batch whose float32 activations fit in memory_budget: per edge, the two gathered
+    embeddings and their product, plus the input and output of the widest linear layer
+    """
+    widths = [module.out_features for module in predictor.modules() if isinstance(module, torch.nn.Linear)]
+    per_edge = 4 * (3 * emb_dim + 2 * max(widths + [emb_dim]))
+    return int(min(MAX_BATCH_SIZE, max(1, memory_budget // per_edge)))
+
+
+def edge_tensor(edge_list, device=None) -> torch.Tensor:
+    """(E, 2) int64 tensor of the edges; numpy arrays and tensors are not copied on the CPU"""
+    edges = torch.as_tensor(edge_list)
+    return edges.reshape(-1, 2).to(device=device, dtype=torch.int64)
+
+
+def score_batches(predictor, node_emb, edge_list, batch_size=None, memory_budget=MEMORY_BUDGET):
+    """Yields (start, scores) for consecutive batches of edge_list, scores as a float32 numpy array"""
+    predictor.eval()
+    edges = edge_tensor(edge_list, node_emb.device)
+    if batch_size is None:
+        batch_size = batch_size_for(predictor, node_emb.size(-1), memory_budget)
+
+    for start in range(0, edges.size(0), batch_size):
+        # inference mode is entered per batch: a generator holding it open would leak it into
+        # the caller's code between batches
+        with torch.inference_mode():
+            edge = edges[start:start + batch_size]
+            scores = predictor(node_emb[edge[:, 0]], node_emb[edge[:, 1]]).view(-1)
+            scores = scores.to(device="cpu", dtype=torch.float32).numpy()
+        yield start, scores
+
+
+def iter_scores(predictor, node_emb, edge_list, batch_size=None, memory_budget=MEMORY_BUDGET):
+    """Streams the scores of edge_list as float32 numpy chunks, in order"""
+    for _, scores in score_batches(predictor, node_emb, edge_list, batch_size, memory_budget):
+        yield scores
+
+
+def score_edges(predictor, node_emb, edge_list, batch_size=None, memory_budget=MEMORY_BUDGET, out=None) -> np.ndarray:
+    """
+    Scores every edge of edge_list into a float32 array of length E, allocated once up front
+    (or `out`, if given)
+    """
+    edges = edge_tensor(edge_list)
+    if out is None:
+        out = np.empty(edges.size(0), dtype=np.float32)
+    for start, scores in score_batches(predictor, node_emb, edges, batch_size, memory_budget):
+        out[start:start + len(scores)] = scores
+    return out
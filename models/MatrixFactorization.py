@@ -3,7 +3,14 @@ import numpy as np
 import torch
 from torch.utils.data import DataLoader
 import torch.nn.functional as F
-from torch_geometric.utils import negative_sampling
+from dataset.graph_convert import graph_tensors, to_csr_graph
+from dataset.graph_store import build_csr, resolve_graph, store_graph
+from models.NegativeSampler import NegativeSampler
+import models.Inference as Inference
+from models.Checkpoint import CheckpointWriter, is_checkpoint, load_checkpoint, make_checkpoint, save_checkpoint
+import os
+
+MODEL_PATH = "models/trained_model_files/mf_model.pt"
 
 class MLPLinkPredictor(torch.nn.Module):
     def __init__(self, in_channels, hidden_channels, out_channels, num_layers,
@@ -39,8 +46,9 @@ class MatrixFactorization(LinkPredictor):
         self.predictor = None
         self.emb = None
         self.edge_index = None
+        self.config = None
 
-    def train(self, graph:list, val_edges):
+    def train(self, graph:list, val_edges, negative_sampler=None, seed=0):
         num_nodes = graph.number_of_nodes()
         hidden_channels = 256
         num_layers = 3
@@ -54,6 +62,8 @@ class MatrixFactorization(LinkPredictor):
 
         self.predictor = MLPLinkPredictor(hidden_channels, hidden_channels, 1,
                               num_layers, dropout).to(device)
+        self.config = {"num_nodes": num_nodes, "hidden_channels": hidden_channels, "num_layers": num_layers,
+                       "dropout": dropout}
 
         self.predictor.reset_parameters()
         self.emb.reset_parameters()
@@ -61,37 +71,27 @@ class MatrixFactorization(LinkPredictor):
         optimizer = torch.optim.Adam(
             list(self.emb.parameters()) + list(self.predictor.parameters()), lr=lr)
 
-        pos_list = []
-        edge_list = [[], []]
-        seen_nodes = set()
-
-        for node, nbr_dict in graph.adjacency():
-            seen_nodes.add(node)
-            for n in nbr_dict.keys():
-                if n not in seen_nodes:
-                    pos_list.append([node, n])
-                edge_list[0].append(int(node))
-                edge_list[0].append(int(n))
-                edge_list[1].append(int(n))
-                edge_list[1].append(int(node))
-
-        pos_train_edge = torch.tensor(pos_list).to(device)
-        edge_index = torch.tensor(edge_list).to(device)
+        csr = to_csr_graph(graph)
+        self.config["graph"] = store_graph(csr)
+        pos_train_edge, edge_index = graph_tensors(csr, device)
         self.edge_index= edge_index
+        if negative_sampler is None:
+            negative_sampler = NegativeSampler(csr, seed=seed, device=device)
 
         if val_edges is not None:
             pos_val_edges = val_edges["edge"]
             neg_val_edges = val_edges["edge_neg"]
 
         min_loss = None
+        # the best model so far is written to MODEL_PATH in the background
+        writer = CheckpointWriter(os.path.dirname(MODEL_PATH), keep=1, mode="min")
 
         for epoch in range(1, epochs + 1):
             self.predictor.train()
             total_loss = total_examples = 0
 
-            for perm in DataLoader(range(pos_train_edge.size(0)), batch_size,
-                        shuffle=True):
-
+            batches = list(DataLoader(range(pos_train_edge.size(0)), batch_size, shuffle=True))
+            for perm, neg_edge in zip(batches, negative_sampler.epoch(batches, pos_train_edge)):
 
                 optimizer.zero_grad()
 
@@ -100,9 +100,7 @@ class MatrixFactorization(LinkPredictor):
                 pos_out = self.predictor(self.emb.weight[edge[0]], self.emb.weight[edge[1]])
                 pos_loss = -torch.log(pos_out + 1e-15).mean()
 
-                edge = negative_sampling(edge_index, num_nodes=self.emb.weight.size(0),
-                                        num_neg_samples=perm.size(0), method='dense')
-
+                edge = neg_edge
                 neg_out = self.predictor(self.emb.weight[edge[0]], self.emb.weight[edge[1]])
                 neg_loss = -torch.log(1 - neg_out + 1e-15).mean()
 
@@ -119,8 +117,7 @@ class MatrixFactorization(LinkPredictor):
             pos_out = self.predictor(self.emb.weight[edge[0]], self.emb.weight[edge[1]])
             pos_loss = -torch.log(pos_out + 1e-15).mean()
 
-            edge = negative_sampling(self.edge_index, num_nodes=self.emb.weight.size(0),
-                                    num_neg_samples=perm.size(0), method='dense')
+            edge = negative_sampler.sample(perm.size(0))
 
             neg_out = self.predictor(self.emb.weight[edge[0]], self.emb.weight[edge[1]])
             neg_loss = -torch.log(1 - neg_out + 1e-15).mean()
@@ -129,48 +126,68 @@ class MatrixFactorization(LinkPredictor):
 
             if (min_loss is None) or (val_loss < min_loss):
                 print("saving")
-                min_loss = val_loss
-                self.save_model()
+                min_loss = val_loss.item()
+                writer.submit(self.checkpoint(), os.path.basename(MODEL_PATH), min_loss, epoch=epoch)
 
             print(epoch, min_loss)
-                
+
+        writer.close()
         return total_loss / total_examples
 
     def score_edge(self, node1:int, node2:int) -> float:
-        import ipdb
-        ipdb.set_trace()
         self.predictor.eval()
         edge_list = [[node1, node2]]
-        pred_list = self.score_edges(edge_list, batch_size=1)
+        pred_list = self.score_edges(edge_list)
         return pred_list[0]
 
 
-    def score_edges(self, edge_list:list):
-        batch_size = 64 * 1024
-        self.predictor.eval()
-        edges = torch.tensor(edge_list)
+    def score_edges(self, edge_list:list, batch_size=None) -> np.ndarray:
+        """float32 scores of the edges; the batch size is chosen from the memory budget of models.Inference by default"""
+        return Inference.score_edges(self.predictor, self.emb.weight, edge_list, batch_size)
+
+    def iter_scores(self, edge_list:list, batch_size=None):
+        """Streams the scores of edge_list as float32 chunks, see score_edges"""
+        return Inference.iter_scores(self.predictor, self.emb.weight, edge_list, batch_size)
 
-        preds = []
-        for perm in DataLoader(range(edges.size(0)), batch_size):
-            edge = edges[perm].t()
-            preds += [self.predictor(self.emb.weight[edge[0]], self.emb.weight[edge[1]]).squeeze().cpu()]
-        pred = torch.cat(preds, dim=0)
-        pred_list = pred.detach().cpu().numpy() 
-        return pred_list
+    def graph_key(self):
+        """Hash of the training graph in the graph store"""
+        if "graph" not in self.config:   # legacy model, saved with its edge_index
+            self.config["graph"] = store_graph(build_csr(self.edge_index.t().cpu().numpy(), self.config["num_nodes"]))
+        return self.config["graph"]
+
+    def training_graph(self):
+        """CSRGraph of the training graph, memory-mapped from the graph store"""
+        return resolve_graph(self.graph_key())
+
+    def checkpoint(self):
+        """state_dicts and hyperparameters; the training graph is only referenced by its hash in the graph store"""
+        self.graph_key()
+        return make_checkpoint("MatrixFactorization", {"emb": self.emb, "link_predictor": self.predictor}, self.config)
 
     def save_model(self, model_path=None):
         if model_path is None:
-            model_path = "models/trained_model_files/mf_model.pt"
-        torch.save({
-            "emb": self.emb,
-            "link_predictor": self.predictor,
-            "edge_index": self.edge_index
-        }, model_path)
+            model_path = MODEL_PATH
+        save_checkpoint(model_path, self.checkpoint())
 
     def load_model(self, model_path = None):
         if model_path is None:
-            model_path = "models/trained_model_files/mf_model.pt"
-        model_dict = torch.load(model_path)
-        self.predictor = model_dict['link_predictor']
-        self.emb = model_dict['emb']
-        self.edge_index = model_dict["edge_index"]
+            model_path = MODEL_PATH
+        model_dict = load_checkpoint(model_path, "MatrixFactorization")
+        if not is_checkpoint(model_dict):   # legacy file of pickled modules
+            self.predictor = model_dict['link_predictor']
+            self.emb = model_dict['emb']
+            self.edge_index = model_dict["edge_index"]
+            self.config = {"num_nodes": self.emb.num_embeddings, "hidden_channels": self.emb.embedding_dim,
+                           "num_layers": len(self.predictor.lins), "dropout": self.predictor.dropout}
+            return
+
+        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        self.config = model_dict["config"]
+        self.edge_index = None
+        hidden_channels = self.config["hidden_channels"]
+        self.emb = torch.nn.Embedding(self.config["num_nodes"], hidden_channels)
+        self.predictor = MLPLinkPredictor(hidden_channels, hidden_channels, 1,
+                                          self.config["num_layers"], self.config["dropout"])
+        self.emb.load_state_dict(model_dict["state"]["emb"])
+        self.predictor.load_state_dict(model_dict["state"]["link_predictor"])
+        self.emb, self.predictor = self.emb.to(device), self.predictor.to(device)
@@ -0,0 +1,151 @@
+import queue
+import threading
+
+import numpy as np
+import torch
+
+from dataset.edge_keys import EdgeIndex
+from dataset.graph_convert import to_csr_graph
+
+
+class NegativeSampler:
+    """
+    Draws negative (non-)edges of a fixed training graph for the torch models. It is built once
+    per graph: the edges go into a sorted int64 key index (EdgeIndex) and candidates are drawn in
+    vectorized batches and rejected if they are self loops or edges of the graph, so sampling
+    costs O(B log E) per batch instead of an N x N mask per call.
+
+    graph: networkx graph or CSRGraph of the training data
+    distribution: how nodes are drawn, "uniform" or "degree" (proportional to degree^0.75,
+        the usual word2vec-style smoothing)
+    corrupt: if True, epoch() corrupts the positive batches (keeps each source, draws a new
+        target) instead of drawing both endpoints
+    pool: if True, epoch() draws the negatives of a whole epoch in one pass and slices batches
+        out of that pool, instead of sampling batch by batch
+    prefetch: if > 0, epoch() samples in a background thread, keeping up to `prefetch` batches
+        ready ahead of the training loop
+    """
+
+    def __init__(self, graph, distribution="uniform", corrupt=False, pool=False, prefetch=0,
+                 seed=None, device=None) -> None:
+        if distribution not in ("uniform", "degree"):
+            raise Exception(f"{distribution} is not a supported negative sampling distribution.")
+
+        csr = to_csr_graph(graph)
+        self.num_nodes = csr.num_nodes
+        self.edges = EdgeIndex.from_edges(csr.edges(), self.num_nodes)
+        self.distribution = distribution
+        self.corrupt_batches = corrupt
+        self.pool = pool
+        self.prefetch = prefetch
+        self.device = device
+        self.rng = np.random.default_rng(seed)
+
+        self.cdf = None
+        if distribution == "degree":
+            weights = np.asarray(csr.degree(), dtype=np.float64) ** 0.75
+            self.cdf = np.cumsum(weights) / weights.sum()
+
+    def nodes(self, num:int, rng=None) -> np.ndarray:
+        rng = self.rng if rng is None else rng
+        if self.cdf is None:
+            return rng.integers(0, self.num_nodes, num)
+        return np.minimum(np.searchsorted(self.cdf, rng.random(num), side="right"), self.num_nodes - 1)
+
+    def invalid(self, u:np.ndarray, v:np.ndarray) -> np.ndarray:
+        """Mask of the pairs that are self loops or edges of the graph"""
+        keys = np.minimum(u, v) * self.num_nodes + np.maximum(u, v)
+        return (u == v) | self.edges.contains_keys(keys)
+
+    def targets(self, sources:np.ndarray, rng=None, max_rounds=100) -> np.ndarray:
+        """
+        Draws a target for every source so that no (source, target) pair is an edge. Rejected
+        pairs are redrawn; after max_rounds (only possible for sources adjacent to almost every
+        node) the remaining draws are kept as they are.
+        """
+        targets = self.nodes(len(sources), rng)
+        bad = self.invalid(sources, targets)
+        for _ in range(max_rounds):
+            if not bad.any():
+                break
+            redraw = np.flatnonzero(bad)
+            targets[redraw] = self.nodes(len(redraw), rng)
+            bad[redraw] = self.invalid(sources[redraw], targets[redraw])
+        return targets
+
+    def sample(self, num:int, rng=None) -> torch.Tensor:
+        """(2, num) tensor of negative edges with both endpoints drawn from the distribution"""
+        sources = self.nodes(num, rng)
+        return self.to_tensor(sources, self.targets(sources, rng))
+
+    def corrupt(self, pos_edge:torch.Tensor, rng=None) -> torch.Tensor:
+        """
+        Corrupts a (2, B) batch of positive edges: keeps every source and replaces the target
+        with one drawn from the distribution (degree-biased corruption with distribution="degree")
+        """
+        sources = pos_edge[0].cpu().numpy().astype(np.int64)
+        return self.to_tensor(sources, self.targets(sources, rng))
+
+    def to_tensor(self, sources, targets) -> torch.Tensor:
+        return torch.from_numpy(np.stack([sources, targets])).to(self.device)
+
+    def epoch(self, batches, pos_edge=None):
+        """
+        Iterator over the negative batches of one epoch: one (2, B) tensor per batch of
+        `batches`, the index tensors of the positive batches (e.g. a DataLoader over
+        range(num_positives)). pos_edge, the (E, 2) positive edges, is only needed with corrupt=True.
+        """
+        batches = [torch.as_tensor(batch) for batch in batches]
+        if self.corrupt_batches and pos_edge is None:
+            raise Exception("corrupting negative sampler needs the positive edges")
+        if self.prefetch <= 0:
+            return self.generate(batches, pos_edge, self.rng)
+
+        # the thread gets its own stream so it never shares a Generator with the caller
+        rng = np.random.default_rng(self.rng.integers(2**63))
+        return prefetched(self.generate(batches, pos_edge, rng), self.prefetch)
+
+    def generate(self, batches, pos_edge, rng):
+        sizes = [len(batch) for batch in batches]
+        if self.pool:
+            if self.corrupt_batches:
+                negatives = self.corrupt(pos_edge[torch.cat(batches)].T, rng)
+            else:
+                negatives = self.sample(sum(sizes), rng)
+            yield from torch.split(negatives, sizes, dim=1)
+            return
+
+        for batch in batches:
+            if self.corrupt_batches:
+                yield self.corrupt(pos_edge[batch].T, rng)
+            else:
+                yield self.sample(len(batch), rng)
+
+
+def prefetched(iterator, size:int):
+    """
+    Starts running `iterator` in a daemon thread right away, keeping up to `size` items ready in
+    a queue, and returns an iterator over them
+    """
+    items = queue.Queue(maxsize=size)
+    done = object()
+
+    def produce():
+        try:
+            for item in iterator:
+                items.put(item)
+        except Exception as e:
+            items.put(e)
+        items.put(done)
+
+    def consume():
+        while True:
+            item = items.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    threading.Thread(target=produce, daemon=True).start()
+    return consume()
@@ -7,6 +7,8 @@ import argparse
 import torch
 from torch_geometric.nn import Node2Vec
 from dataset.utils import load_data
+from dataset.perturbation import output_path
+from dataset.graph_convert import edge_index
 
 
 
@@ -15,19 +17,7 @@ def save_embedding(model, embedding_file_path):
 
 # extract the edge indices of the graph, and convert it to pytorch tensor
 def extract_edge_index(graph, device):
-    edge_list = [[], []]
-    seen_nodes = set()
-
-    for node, nbr_dict in graph.adjacency():
-        seen_nodes.add(node)
-        for n in nbr_dict.keys():
-            edge_list[0].append(int(node))
-            edge_list[0].append(int(n))
-            edge_list[1].append(int(n))
-            edge_list[1].append(int(node))
-
-    edge_index = torch.tensor(edge_list).to(device)
-    return edge_index
+    return edge_index(graph, device)
 
 
 def start_random_walk(graph, file_name):
@@ -78,8 +68,8 @@ def start_random_walk(graph, file_name):
 if __name__ == "__main__":
     percentages = [0.5]
     for percentage in percentages:
-        edge_file_path = f"dataset/perturbation/adversial_remove_{percentage}.csv"
+        perturbation_path = output_path("adversial_remove")
         embedding_file_path = f"models/RandomWalkEmbeddings/adversial_remove_{percentage}.pt"
-        print(f"searching for edge csv file in {edge_file_path}")
-        G, _ = load_data(edge_file_path)
+        print(f"loading {percentage} of the perturbation in {perturbation_path}")
+        G, _ = load_data(perturbation_path=perturbation_path, perturbation_proportion=percentage)
         start_random_walk(G, embedding_file_path)
\ No newline at end of file
@@ -1,10 +1,12 @@
 
 import torch
 import torch.nn.functional as F
-from torch.utils.data import DataLoader
-from torch_geometric.utils import negative_sampling
 
-from ogb.linkproppred import Evaluator
+from models.Evaluation import SampledValidation, degree_strata, evaluate
+import dataset.graph_convert as graph_convert
+from models.NegativeSampler import NegativeSampler
+import models.Inference as Inference
+from models.Checkpoint import CheckpointWriter, is_checkpoint, load_checkpoint, make_checkpoint, save_checkpoint
 import numpy as np
 import os
 
@@ -27,7 +29,10 @@ class LinkPredictor(torch.nn.Module):
             lin.reset_parameters()
 
     def forward(self, x_i, x_j):
-        x = x_i * x_j
+        return self.mlp(x_i * x_j)
+
+    def mlp(self, x):
+        """Scores precomputed Hadamard features x_i * x_j"""
         for lin in self.lins[:-1]:
             x = lin(x)
             x = F.relu(x)
@@ -36,23 +41,39 @@ class LinkPredictor(torch.nn.Module):
         return torch.sigmoid(x)
 
 
-def train(predictor, node_embs, pos_train_edge, edge_index, optimizer, batch_size):
+def hadamard_features(node_embs, edges, max_bytes=None):
+    """
+    (E, d) buffer of node_embs[u] * node_embs[v] for the (E, 2) edges, computed once since the
+    embeddings are frozen. Returns None if the buffer would take more than max_bytes.
+    """
+    edges = torch.as_tensor(edges).to(node_embs.device)
+    if max_bytes is not None and edges.size(0) * node_embs.size(-1) * node_embs.element_size() > max_bytes:
+        return None
+    with torch.no_grad():
+        return node_embs[edges[:, 0]] * node_embs[edges[:, 1]]
+
+
+def train(predictor, node_embs, pos_train_edge, negative_sampler, optimizer, batch_size, pos_features=None):
+    """
+    One epoch over the positive edges. pos_features, the hadamard_features of pos_train_edge, skips
+    gathering the positive pairs' embeddings on every batch.
+    """
     predictor.train()
 
     total_loss = total_examples = 0
 
-    for perm in DataLoader(range(pos_train_edge.size(0)), batch_size,
-                           shuffle=True):
+    batches = torch.randperm(pos_train_edge.size(0), device=pos_train_edge.device).split(batch_size)
+    for perm, neg_edge in zip(batches, negative_sampler.epoch(batches, pos_train_edge)):
         optimizer.zero_grad()
 
-        edge = pos_train_edge[perm].t()
-
-        pos_out = predictor(node_embs[edge[0]], node_embs[edge[1]])
+        if pos_features is not None:
+            pos_out = predictor.mlp(pos_features[perm])
+        else:
+            edge = pos_train_edge[perm].t()
+            pos_out = predictor(node_embs[edge[0]], node_embs[edge[1]])
         pos_loss = -torch.log(pos_out + 1e-15).mean()
 
-        edge = negative_sampling(edge_index, num_nodes=node_embs.size(0),
-                                 num_neg_samples=perm.size(0), method='dense')
-
+        edge = neg_edge
         neg_out = predictor(node_embs[edge[0]], node_embs[edge[1]])
         neg_loss = -torch.log(1 - neg_out + 1e-15).mean()
 
@@ -80,99 +101,146 @@ class RandomWalkMLP():
         self.link_predictor = None
         self.embedding_path = None
 
+    def checkpoint(self, inline_embeddings=True):
+        """
+        Checkpoint of the link predictor. The node embeddings are stored too unless
+        inline_embeddings is False, in which case only embedding_path is recorded.
+        """
+        config = {"in_channels": self.node_embs.size(-1), "hidden_channels": self.hidden_channels,
+                  "num_layers": self.num_layers, "dropout": self.dropout, "embedding_path": self.embedding_path}
+        tensors = {"node_embs": self.node_embs} if inline_embeddings else {}
+        return make_checkpoint("RandomWalkMLP", {"link_predictor": self.link_predictor}, config, tensors)
+
     def save_model(self, model_path=None): 
-        torch.save({
-            "link_predictor": self.link_predictor,
-            "node_embs": self.node_embs
-        }, model_path)
+        save_checkpoint(model_path, self.checkpoint())
     
     def load_model(self, model_path=None):        
-        model_dict = torch.load(model_path)
-        self.link_predictor = model_dict["link_predictor"]
-        self.node_embs = model_dict["node_embs"]
+        model_dict = load_checkpoint(model_path, "RandomWalkMLP")
+        if not is_checkpoint(model_dict):   # legacy file of pickled modules
+            self.link_predictor = model_dict["link_predictor"]
+            self.node_embs = model_dict["node_embs"]
+            return
+
+        config = model_dict["config"]
+        self.hidden_channels, self.num_layers, self.dropout = config["hidden_channels"], config["num_layers"], config["dropout"]
+        self.embedding_path = config["embedding_path"]
+        self.link_predictor = LinkPredictor(config["in_channels"], self.hidden_channels, 1, self.num_layers, self.dropout)
+        self.link_predictor.load_state_dict(model_dict["state"]["link_predictor"])
+        if "node_embs" in model_dict["tensors"]:
+            self.node_embs = model_dict["tensors"]["node_embs"]
+        else:
+            self.node_embs = torch.load(self.embedding_path, map_location='cpu')
     
     def score_edge(self, node1, node2):
         self.link_predictor.eval()
         edge_list = [[node1, node2]]
-        pred_list = self.score_edges(edge_list, batch_size=1)
+        pred_list = self.score_edges(edge_list)
         return pred_list[0]
     
 
-    def score_edges(self, edge_list, batch_size=1):
+    def score_edges(self, edge_list, batch_size=None):
+        """float32 scores of the edges; the batch size is chosen from the memory budget of models.Inference by default"""
+        return Inference.score_edges(self.link_predictor, self.node_embs, edge_list, batch_size)
+
+    def iter_scores(self, edge_list, batch_size=None):
+        """Streams the scores of edge_list as float32 chunks, see score_edges"""
+        return Inference.iter_scores(self.link_predictor, self.node_embs, edge_list, batch_size)
+
+    def score_features(self, features, batch_size=None) -> np.ndarray:
+        """float32 scores of precomputed hadamard_features, in large batches (see models.Inference)"""
         self.link_predictor.eval()
-        edges = torch.tensor(edge_list)
-        preds = []
-        for perm in DataLoader(range(edges.size(0)), batch_size):
-            edge = edges[perm].t()
-            x = self.link_predictor(self.node_embs[edge[0]], self.node_embs[edge[1]]).squeeze().cpu()
-            preds.append(x.detach().numpy())
-        return preds
-
-    def train(self, graph, val_edges, embedding_path, out_path):   
+        if batch_size is None:
+            batch_size = Inference.batch_size_for(self.link_predictor, features.size(-1))
+        out = np.empty(features.size(0), dtype=np.float32)
+        with torch.inference_mode():
+            for start in range(0, features.size(0), batch_size):
+                scores = self.link_predictor.mlp(features[start:start + batch_size]).view(-1)
+                out[start:start + len(scores)] = scores.cpu().numpy()
+        return out
+
+    def train(self, graph, val_edges, embedding_path, out_path, negative_sampler=None, keep_checkpoints=3, seed=0,
+              cache_train_features=False, feature_budget=2**30, validation="full", val_fraction=0.2, val_neg_fraction=1.0):
+        """
+        Trains the MLP on the frozen embeddings at embedding_path. The Hadamard features of the
+        validation edges are computed once and scored in large batches every epoch;
+        cache_train_features does the same for the positive training edges. Either buffer is
+        skipped (falling back to per-batch gathers) if it would take more than feature_budget bytes.
+
+        seed: seed of the default (uniform) negative sampler and of the validation subsample
+
+        validation: "full" scores all of val_edges every epoch, "sampled" a degree-stratified
+            val_fraction of the positives and val_neg_fraction of the negatives, escalating to the
+            full set only when the epoch may be a new best (see models.Evaluation.SampledValidation)
+        """
+        if validation not in ("full", "sampled"):
+            raise Exception(f"{validation} is not a supported validation mode.")
         device = 'cpu'
         device = torch.device(device)
 
-        pos_list = []
-        edge_list = [[], []]
-        seen_nodes = set()
-
-        for node, nbr_dict in graph.adjacency():
-            seen_nodes.add(node)
-            for n in nbr_dict.keys():
-                if n not in seen_nodes:
-                    pos_list.append([node, n])
-                edge_list[0].append(int(node))
-                edge_list[0].append(int(n))
-                edge_list[1].append(int(n))
-                edge_list[1].append(int(node))
-
-        pos_train_edge = torch.tensor(pos_list).to(device)
-        edge_index = torch.tensor(edge_list).to(device)
+        csr = graph_convert.to_csr_graph(graph)
+        pos_train_edge = graph_convert.pos_train_edge(csr, device)
+        if negative_sampler is None:
+            negative_sampler = NegativeSampler(csr, seed=seed, device=device)
 
         self.node_embs = torch.load(embedding_path, map_location='cpu').to(device)
+        self.embedding_path = embedding_path
 
-        evaluator = Evaluator(name='ogbl-ddi')
         
         self.link_predictor = LinkPredictor(self.node_embs.size(-1), self.hidden_channels, 1,
                                 self.num_layers, self.dropout).to(device)
 
         optimizer = torch.optim.Adam(self.link_predictor.parameters(), lr=self.lr)
 
+        val_features = {key: hadamard_features(self.node_embs, val_edges[key], feature_budget) for key in ["edge", "edge_neg"]}
+        pos_features = hadamard_features(self.node_embs, pos_train_edge, feature_budget) if cache_train_features else None
+
+        def score(key, index=None):
+            """Scores of val_edges[key][index], from the feature buffer if there is one"""
+            if val_features[key] is not None:
+                return self.score_features(val_features[key] if index is None else val_features[key][index])
+            return self.score_edges(val_edges[key] if index is None else val_edges[key][index])
+
+        if validation == "sampled":
+            degree = csr.degree()
+            validator = SampledValidation(degree_strata(val_edges["edge"], degree), degree_strata(val_edges["edge_neg"], degree),
+                                          fraction=val_fraction, neg_fraction=val_neg_fraction, seed=seed)
+
+        # checkpoints are written in the background and only reference the embedding file
+        writer = CheckpointWriter(f"{out_path}/randomwalk_trained", keep=keep_checkpoints)
+
         max_val = -1
         for epoch in range(self.epochs):
             loss = train(predictor = self.link_predictor,
                          pos_train_edge = pos_train_edge,
                          node_embs = self.node_embs,
-                         edge_index = edge_index,
+                         negative_sampler = negative_sampler,
                          optimizer = optimizer,
-                         batch_size = self.batch_size)
+                         batch_size = self.batch_size,
+                         pos_features = pos_features)
             
             print(f"Epoch {epoch + 1}: loss: {round(loss, 5)}")
 
             result = {}
 
-            pos_valid_preds = self.score_edges(val_edges["edge"])
-            neg_valid_preds = self.score_edges(val_edges["edge_neg"])
-
-            # metrics on validation test
-            for K in [20]:
-                evaluator.K = K
-                hits = evaluator.eval({
-                    'y_pred_pos': np.array(pos_valid_preds),
-                    'y_pred_neg': np.array(neg_valid_preds),
-                })[f'hits@{K}']
+            if validation == "sampled":
+                result.update(validator.validate(score, max_val))
+            else:
+                # metrics on validation test
+                metrics = evaluate(score("edge"), score("edge_neg"), ks=[20], ranks=False)
+                for K in [20]:
+                    result[f'Hits@{K}'] = metrics[f'hits@{K}']
 
-                result[f'Hits@{K}'] = hits
-
-            val_performance = result['Hits@20']
+            # sampled epochs that could not be a new best have no full-set Hits@20
+            val_performance = result.get('Hits@20')
 
             # print results every 10 iterations
             if (epoch + 1) % 10 == 0:
                 print(result)
 
             # only save model file if the results increase in performance
-            if val_performance > max_val:
-                os.makedirs(f"{out_path}/randomwalk_trained/", exist_ok=True)
-                self.save_model(model_path=f"{out_path}/randomwalk_trained/ep{epoch}_randomwalk.pt")
+            if val_performance is not None and val_performance > max_val:
+                writer.submit(self.checkpoint(inline_embeddings=False), f"ep{epoch}_randomwalk.pt", val_performance, epoch=epoch)
                 max_val = val_performance
-                print("=> Performance improvement for Hits@20 =", max_val)
\ No newline at end of file
+                print("=> Performance improvement for Hits@20 =", max_val)
+
+        writer.close()
\ No newline at end of file
@@ -0,0 +1,77 @@
+"""
+Versioned on-disk format for models that are just a handful of arrays.
+
+An artifact is a directory holding one `.npy` file per array plus a manifest:
+
+    manifest.json   version, model type, array names/shapes/dtypes and a free-form config
+    <name>.npy      one per array
+
+Arrays are loaded with `mmap_mode="r"`, so loading is near-instant whatever the model size and
+every process scoring with the same model shares one page-cache copy.
+"""
+
+import json
+import os
+
+import numpy as np
+import scipy.sparse as sp
+
+from dataset.graph_store import publish_dir
+
+ARTIFACT_VERSION = 1
+MANIFEST = "manifest.json"
+
+
+def save_artifact(path:str, model_type:str, arrays:dict, config=None) -> None:
+    """
+    Writes `arrays` (name -> np.ndarray) to the artifact directory `path`, replacing any previous
+    artifact there (see publish_dir)
+    """
+    manifest = {
+        "version": ARTIFACT_VERSION,
+        "model": model_type,
+        "arrays": {},
+        "config": config or {},
+    }
+
+    with publish_dir(path, replace=True) as tmp_path:
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            np.save(os.path.join(tmp_path, f"{name}.npy"), array)
+            manifest["arrays"][name] = {"shape": list(array.shape), "dtype": str(array.dtype)}
+        with open(os.path.join(tmp_path, MANIFEST), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+
+def is_artifact(path) -> bool:
+    return path is not None and os.path.isfile(os.path.join(path, MANIFEST))
+
+
+def load_artifact(path:str, model_type=None, mmap_mode="r"):
+    """Returns the (memory-mapped, read-only by default) arrays of an artifact and its manifest"""
+    with open(os.path.join(path, MANIFEST), 'r') as f:
+        manifest = json.load(f)
+    if manifest["version"] != ARTIFACT_VERSION:
+        raise Exception(f"{path} has artifact version {manifest['version']}, expected {ARTIFACT_VERSION}")
+    if model_type is not None and manifest["model"] != model_type:
+        raise Exception(f"{path} holds a {manifest['model']} model, expected {model_type}")
+
+    arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in manifest["arrays"]}
+    return arrays, manifest
+
+
+def csr_arrays(matrix) -> dict:
+    """The arrays of a scipy CSR matrix, as stored in an artifact"""
+    matrix = sp.csr_matrix(matrix)
+    return {
+        "indptr": matrix.indptr,
+        "indices": matrix.indices,
+        "data": matrix.data,
+        "shape": np.asarray(matrix.shape, dtype=np.int64),
+    }
+
+
+def csr_from_arrays(arrays:dict) -> sp.csr_matrix:
+    """Rebuilds a CSR matrix on top of the (memory-mapped) arrays written by csr_arrays, without copying"""
+    shape = tuple(int(n) for n in arrays["shape"])
+    return sp.csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape=shape, copy=False)